@@ -0,0 +1,68 @@
+"""
+Compares the old `eval`-based response parsing with `decode_completion`.
+
+    python -m bench.bench_decode --n 100000
+"""
+
+import argparse
+import json
+import time
+
+from src.response import decode_completion
+
+
+def make_bodies(n: int):
+    content = "[정답] (2) 강박장애\n[풀이과정]\n- 문제에 따르면 환자의 증상은 ...\n" * 4
+    ok = {
+        "status": {"code": "20000", "message": "OK"},
+        "result": {
+            "message": {"role": "assistant", "content": content},
+            "stopReason": "stop_before",
+            "inputLength": 312,
+            "outputLength": 128,
+            "aiFilter": None,
+            "seed": 1234,
+            "ai_filter_enabled": False,
+        },
+    }
+    throttled = {"status": {"code": "42901", "message": "Too many requests"}, "result": None}
+    bodies = []
+    for i in range(n):
+        data = throttled if i % 20 == 0 else ok
+        bodies.append(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+    return bodies
+
+
+def parse_eval(body: bytes):
+    # the parsing previously done in CompletionExecutor.execute_async
+    response = body.decode("utf-8")
+    try:
+        result = eval(response)
+        return result["result"]["message"]
+    except:
+        return None
+
+
+def parse_decode(body: bytes):
+    result = decode_completion(body)
+    return result.message if result.ok else None
+
+
+def run(name, fn, bodies):
+    start = time.perf_counter()
+    parsed = sum(fn(body) is not None for body in bodies)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<8} {elapsed:8.3f}s  {len(bodies) / elapsed:12,.0f} resp/s  "
+        f"parsed {parsed}/{len(bodies)}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="response decoding benchmark")
+    parser.add_argument("--n", type=int, default=100000)
+    args = parser.parse_args()
+
+    bodies = make_bodies(args.n)
+    run("eval", parse_eval, bodies)
+    run("decode", parse_decode, bodies)
@@ -0,0 +1,119 @@
+"""
+Offline load test of the src/server.py service against bench/mock_server.py.
+
+    python -m bench.load_test --clients 50 --requests 1000 --rate 50 --max-concurrency 50
+
+Starts the mock upstream and the service on local ports, sends the banana
+questions from `--clients` concurrent clients and reports throughput and
+client-side p50/p95/p99 latency, followed by the service's own /metrics.
+"""
+
+import argparse
+import asyncio
+import itertools
+import time
+
+import aiohttp
+from aiohttp import web
+
+from bench.mock_server import MockConfig, MockServer
+from bench.run_bench import percentile
+from src.model import BananaPunch, CompletionExecutorPool
+from src.server import BananaService
+
+
+async def client(session, url: str, questions, latencies: list, statuses: dict):
+    for question in questions:
+        start = time.perf_counter()
+        try:
+            async with session.post(f"{url}/chat", json={"question": question}) as r:
+                await r.read()
+                status = r.status
+        except aiohttp.ClientError:
+            status = "transport"
+        latencies.append(time.perf_counter() - start)
+        statuses[status] = statuses.get(status, 0) + 1
+
+
+async def main(args):
+    server = MockServer(
+        MockConfig(
+            latency=args.latency,
+            latency_mean=args.latency_mean,
+            latency_sigma=args.latency_sigma,
+            error_429=args.error_429,
+            error_500=args.error_500,
+        )
+    )
+    server.start()
+
+    punch = BananaPunch(use_cache=False)
+    scheduler_config = {**(punch.api_info.get("scheduler") or {})}
+    if args.max_concurrency:
+        scheduler_config["max_concurrency"] = args.max_concurrency
+    if args.rate:
+        scheduler_config["rate"] = args.rate
+        scheduler_config["burst"] = max(1, int(args.rate))
+    punch.hcx = CompletionExecutorPool.from_config(
+        {**punch.h_params, "host": server.url}, scheduler_config, tracer=punch.tracer
+    )
+    service = BananaService.from_config(punch)
+
+    runner = web.AppRunner(service.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    questions = [
+        q for data in punch.questions.values() for q in data["질문"].tolist()
+    ]
+    stream = itertools.islice(itertools.cycle(questions), args.requests)
+    shares = [[] for _ in range(args.clients)]
+    for i, question in enumerate(stream):
+        shares[i % args.clients].append(question)
+
+    latencies, statuses = [], {}
+    connector = aiohttp.TCPConnector(limit=args.clients)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            start = time.perf_counter()
+            await asyncio.gather(
+                *[client(session, url, share, latencies, statuses) for share in shares]
+            )
+            elapsed = time.perf_counter() - start
+            async with session.get(f"{url}/health") as r:
+                health = await r.json()
+            async with session.get(f"{url}/metrics") as r:
+                metrics = await r.text()
+    finally:
+        await runner.cleanup()
+        server.stop()
+
+    print(metrics)
+    print(f"health: {health}")
+    print(f"mock server: {dict(server.stats)}")
+    print(
+        f"{len(latencies)} requests from {args.clients} clients in {elapsed:.2f}s "
+        f"({len(latencies) / elapsed:.1f} req/s), status: {statuses}"
+    )
+    print(
+        f"latency p50 {percentile(latencies, 50):.3f}s  "
+        f"p95 {percentile(latencies, 95):.3f}s  p99 {percentile(latencies, 99):.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="offline load test of the HTTP service")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-mean", type=float, default=0.3)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-500", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, help="override api_info.yaml scheduler")
+    parser.add_argument("--rate", type=float, help="override api_info.yaml scheduler (req/s per key)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
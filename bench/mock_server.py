@@ -0,0 +1,439 @@
+"""
+Local stand-in for the Clova Studio and OpenAI endpoints used in src/.
+
+Implements HCX chat-completions (JSON and server-sent events), the tuning task
+create/find endpoints, OpenAI chat completions plus the Files/Batch endpoints
+used by batch jobs and a path-style S3 object/multipart API for Object Storage
+uploads, with configurable latency and 429/500 injection. Run it standalone and point `host` at it:
+
+    python -m bench.mock_server --port 8080 --latency lognormal --error-429 0.05
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+
+from aiohttp import web
+
+
+class MockConfig:
+    def __init__(
+        self,
+        latency: str = "lognormal",
+        latency_mean: float = 0.5,
+        latency_sigma: float = 0.5,
+        error_429: float = 0.0,
+        error_500: float = 0.0,
+        tokens_per_sec: float = 50,
+        seed: int = 42,
+    ):
+        """
+        Args:
+            latency (str): Latency distribution: 'fixed', 'uniform' (0 ~ 2 * mean) or
+                'lognormal' (median `latency_mean`, shape `latency_sigma`).
+            error_429 (float): Probability of answering with 42901 (HTTP 429).
+            error_500 (float): Probability of answering with 50000 (HTTP 500).
+            tokens_per_sec (float): Token rate of streamed responses.
+        """
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.error_429 = error_429
+        self.error_500 = error_500
+        self.tokens_per_sec = tokens_per_sec
+        self.random = random.Random(seed)
+
+    def sample_latency(self):
+        if self.latency == "fixed":
+            return self.latency_mean
+        if self.latency == "uniform":
+            return self.random.uniform(0, 2 * self.latency_mean)
+        return self.random.lognormvariate(0, self.latency_sigma) * self.latency_mean
+
+    def sample_error(self):
+        x = self.random.random()
+        if x < self.error_429:
+            return 429
+        if x < self.error_429 + self.error_500:
+            return 500
+        return None
+
+
+def _hcx_status(code: str, message: str, result=None):
+    return {"status": {"code": code, "message": message}, "result": result}
+
+
+def _hcx_error(status: int):
+    if status == 429:
+        return web.json_response(
+            _hcx_status("42901", "Too many requests - rate exceeded"), status=429
+        )
+    return web.json_response(_hcx_status("50000", "Internal Server Error"), status=500)
+
+
+def _fake_answer(messages: list, rng: random.Random):
+    system = next((m["content"] for m in messages if m["role"] == "system"), "")
+    user = messages[-1]["content"] if messages else ""
+    if "의도" in system:
+        return rng.choice(["가게관련", "상품관련", "기타"])
+    if "[보기]" in user:
+        idx = rng.randint(1, 5)
+        return f"[정답] ({idx}) 보기 {idx}\n[풀이과정]\n- 문제에 따르면 ...\n- 따라서 정답은 ({idx})이다."
+    return "안녕하세요, 바나나 펀치입니다. 문의하신 내용에 대해 안내해 드리겠습니다."
+
+
+def _s3_error(code: str):
+    return f"<Error><Code>{code}</Code><Message>mock</Message></Error>"
+
+
+class MockServer:
+    def __init__(self, config: MockConfig = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockConfig()
+        self.host = host
+        self.port = port
+        self.stats = Counter()
+        self.tasks = {}
+        self.files = {}
+        self.batches = {}
+        self.objects = {}
+        self.uploads = {}
+
+        self._task_ids = itertools.count(1)
+        self._upload_ids = itertools.count(1)
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def app(self):
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/testapp/v1/chat-completions/{model}", self.chat_completions)
+        app.router.add_post("/tuning/v2/tasks", self.create_task)
+        app.router.add_get("/tuning/v2/tasks/{task_id}", self.find_task)
+        app.router.add_post("/v1/chat/completions", self.openai_chat)
+        app.router.add_post("/v1/files", self.openai_upload_file)
+        app.router.add_get("/v1/files/{file_id}/content", self.openai_file_content)
+        app.router.add_post("/v1/batches", self.openai_create_batch)
+        app.router.add_get("/v1/batches/{batch_id}", self.openai_get_batch)
+        # S3 last: its path pattern would shadow the routes above
+        app.router.add_route("*", "/{bucket}/{key:.+}", self.s3_object)
+        return app
+
+    async def _delay(self):
+        await asyncio.sleep(self.config.sample_latency())
+
+    async def chat_completions(self, request):
+        self.stats["hcx_requests"] += 1
+        body = await request.json()
+        await self._delay()
+
+        error = self.config.sample_error()
+        if error:
+            self.stats[f"hcx_{error}"] += 1
+            return _hcx_error(error)
+
+        content = _fake_answer(body.get("messages", []), self.config.random)
+        if request.headers.get("Accept") == "text/event-stream":
+            return await self._stream(request, content)
+
+        self.stats["hcx_ok"] += 1
+        return web.json_response(
+            _hcx_status(
+                "20000",
+                "OK",
+                {
+                    "message": {"role": "assistant", "content": content},
+                    "stopReason": "stop_before",
+                    "inputLength": sum(len(m["content"]) for m in body["messages"]),
+                    "outputLength": len(content),
+                    "aiFilter": None,
+                },
+            )
+        )
+
+    async def _stream(self, request, content: str):
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        try:
+            for i, token in enumerate(content.split(" ")):
+                await asyncio.sleep(1 / self.config.tokens_per_sec)
+                data = {"message": {"role": "assistant", "content": token + " "}}
+                await response.write(
+                    f"id: {i}\nevent: token\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+                )
+            data = {"message": {"role": "assistant", "content": content}}
+            await response.write(
+                f"event: result\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode()
+            )
+            self.stats["hcx_ok"] += 1
+        except ConnectionError:
+            # client stopped reading early
+            self.stats["hcx_stream_cancelled"] += 1
+        return response
+
+    async def create_task(self, request):
+        self.stats["tuning_requests"] += 1
+        body = await request.json()
+        await self._delay()
+        task_id = f"mock{next(self._task_ids):06d}"
+        self.tasks[task_id] = {"created": time.monotonic(), "request": body}
+        return web.json_response(
+            _hcx_status(
+                "20000",
+                "OK",
+                {"id": task_id, "name": body.get("name"), "status": "WAIT"},
+            )
+        )
+
+    async def find_task(self, request):
+        self.stats["tuning_requests"] += 1
+        task_id = request.match_info["task_id"]
+        await self._delay()
+        if task_id not in self.tasks:
+            return web.json_response(_hcx_status("40400", "Not Found"), status=404)
+        # WAIT -> RUNNING -> SUCCEEDED, a few seconds per step
+        elapsed = time.monotonic() - self.tasks[task_id]["created"]
+        status = ["WAIT", "RUNNING", "SUCCEEDED"][min(2, int(elapsed // 2))]
+        return web.json_response(
+            _hcx_status("20000", "OK", {"id": task_id, "status": status})
+        )
+
+    def _openai_completion(self, body: dict):
+        content = f"score: {self.config.random.randint(1, 10)}"
+        return {
+            "id": f"chatcmpl-{self.stats['openai_requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {"prompt_tokens": 100, "completion_tokens": 4, "total_tokens": 104},
+        }
+
+    async def openai_chat(self, request):
+        self.stats["openai_requests"] += 1
+        body = await request.json()
+        await self._delay()
+        error = self.config.sample_error()
+        if error:
+            self.stats[f"openai_{error}"] += 1
+            return web.json_response(
+                {"error": {"message": "mock error", "type": "mock", "code": str(error)}},
+                status=error,
+            )
+        self.stats["openai_ok"] += 1
+        return web.json_response(self._openai_completion(body))
+
+    async def openai_upload_file(self, request):
+        reader = await request.multipart()
+        content = b""
+        async for part in reader:
+            if part.name == "file":
+                content = await part.read()
+        file_id = f"file-{len(self.files) + 1}"
+        self.files[file_id] = content
+        return web.json_response(
+            {
+                "id": file_id,
+                "object": "file",
+                "bytes": len(content),
+                "created_at": int(time.time()),
+                "filename": "batch.jsonl",
+                "purpose": "batch",
+                "status": "processed",
+            }
+        )
+
+    async def openai_file_content(self, request):
+        return web.Response(body=self.files[request.match_info["file_id"]])
+
+    async def openai_create_batch(self, request):
+        self.stats["openai_batches"] += 1
+        body = await request.json()
+        output = []
+        for line in self.files[body["input_file_id"]].decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            self.stats["openai_batch_requests"] += 1
+            output.append(
+                {
+                    "id": f"batch_req_{item['custom_id']}",
+                    "custom_id": item["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "request_id": item["custom_id"],
+                        "body": self._openai_completion(item["body"]),
+                    },
+                    "error": None,
+                }
+            )
+        batch_id = f"batch_{len(self.batches) + 1}"
+        output_file_id = f"file-{batch_id}-output"
+        self.files[output_file_id] = "\n".join(
+            json.dumps(x, ensure_ascii=False) for x in output
+        ).encode("utf-8")
+        self.batches[batch_id] = {
+            "created": time.monotonic(),
+            "input_file_id": body["input_file_id"],
+            "output_file_id": output_file_id,
+            "total": len(output),
+        }
+        return web.json_response(self._batch(batch_id))
+
+    def _batch(self, batch_id: str):
+        batch = self.batches[batch_id]
+        # finishes after one simulated second
+        done = time.monotonic() - batch["created"] > 1
+        return {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": "/v1/chat/completions",
+            "input_file_id": batch["input_file_id"],
+            "completion_window": "24h",
+            "status": "completed" if done else "in_progress",
+            "output_file_id": batch["output_file_id"] if done else None,
+            "error_file_id": None,
+            "created_at": int(time.time()),
+            "request_counts": {
+                "total": batch["total"],
+                "completed": batch["total"] if done else 0,
+                "failed": 0,
+            },
+        }
+
+    async def openai_get_batch(self, request):
+        return web.json_response(self._batch(request.match_info["batch_id"]))
+
+    async def s3_object(self, request):
+        """
+        Path-style S3: PutObject, GetObject and the multipart upload calls.
+        """
+        path = (request.match_info["bucket"], request.match_info["key"])
+        query = request.query
+        if request.method == "GET":
+            if path not in self.objects:
+                return web.Response(status=404, text=_s3_error("NoSuchKey"))
+            return web.Response(body=self.objects[path])
+
+        if request.method == "POST" and "uploads" in query:
+            upload_id = f"upload{next(self._upload_ids)}"
+            self.uploads[upload_id] = {}
+            return web.Response(
+                content_type="application/xml",
+                text=(
+                    "<InitiateMultipartUploadResult>"
+                    f"<Bucket>{path[0]}</Bucket><Key>{path[1]}</Key>"
+                    f"<UploadId>{upload_id}</UploadId>"
+                    "</InitiateMultipartUploadResult>"
+                ),
+            )
+
+        upload_id = query.get("uploadId")
+        if upload_id is not None and upload_id not in self.uploads:
+            return web.Response(status=404, text=_s3_error("NoSuchUpload"))
+
+        if request.method == "PUT":
+            body = await request.read()
+            if upload_id is None:
+                self.objects[path] = body
+                return web.Response(headers={"ETag": '"object"'})
+            self.stats["s3_parts"] += 1
+            await self._delay()
+            if self.config.sample_error():
+                self.stats["s3_part_errors"] += 1
+                return web.Response(status=500, text=_s3_error("InternalError"))
+            part_number = int(query["partNumber"])
+            self.uploads[upload_id][part_number] = body
+            return web.Response(headers={"ETag": f'"part{part_number}"'})
+
+        if request.method == "POST":
+            parts = self.uploads.pop(upload_id)
+            self.objects[path] = b"".join(parts[n] for n in sorted(parts))
+            self.stats["s3_uploads"] += 1
+            return web.Response(
+                content_type="application/xml",
+                text=(
+                    "<CompleteMultipartUploadResult>"
+                    f"<Bucket>{path[0]}</Bucket><Key>{path[1]}</Key>"
+                    '<ETag>"complete"</ETag>'
+                    "</CompleteMultipartUploadResult>"
+                ),
+            )
+
+        if request.method == "DELETE":
+            self.uploads.pop(upload_id, None)
+            self.stats["s3_aborted"] += 1
+            return web.Response(status=204)
+
+        return web.Response(status=405)
+
+    async def _start(self):
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def start(self):
+        """
+        Starts the server on a background thread and returns its base url.
+        """
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            self._loop.run_until_complete(self._start())
+            self._started.set()
+            self._loop.run_forever()
+            self._loop.run_until_complete(self._runner.cleanup())
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self.url
+
+    def stop(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="mock HCX / OpenAI server")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-mean", type=float, default=0.5)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-500", type=float, default=0.0)
+    parser.add_argument("--tokens-per-sec", type=float, default=50)
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency=args.latency,
+        latency_mean=args.latency_mean,
+        latency_sigma=args.latency_sigma,
+        error_429=args.error_429,
+        error_500=args.error_500,
+        tokens_per_sec=args.tokens_per_sec,
+    )
+    server = MockServer(config, port=args.port)
+    print(f"Mock server listening on {server.start()}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
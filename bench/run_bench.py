@@ -0,0 +1,269 @@
+"""
+Offline end-to-end load test of src/model.py, src/tuning.py and src/storage.py against
+bench/mock_server.py.
+
+    python -m bench.run_bench --latency-mean 0.3 --error-429 0.05 --error-500 0.01
+
+Reports throughput, p50/p95/p99 latency per logical call and the number of retries
+(upstream requests minus logical calls) for each scenario.
+"""
+
+import argparse
+import asyncio
+import glob
+import gzip
+import inspect
+import os
+import time
+
+from openai import AsyncClient
+
+from bench.mock_server import MockConfig, MockServer
+from src.model import KMLE, BananaPunch, CompletionExecutorPool
+from src.storage import MIN_PART_SIZE, MultipartWriter, open_text, s3_client
+from src.tuning import create_task
+
+
+def percentile(values: list, q: float):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def timed(fn, latencies: list):
+    """
+    Wraps a callable so that the duration of every call is appended to `latencies`.
+
+    Works for coroutine functions and for plain functions returning an awaitable
+    (e.g. the OpenAI client's `create`); those are timed until the awaitable finishes.
+    """
+
+    async def finish(awaitable, start):
+        try:
+            return await awaitable
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException:
+            latencies.append(time.perf_counter() - start)
+            raise
+        if inspect.isawaitable(result):
+            return finish(result, start)
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    return wrapper
+
+
+class Bench:
+    def __init__(self, server: MockServer, scheduler_config: dict):
+        self.server = server
+        self.scheduler_config = scheduler_config
+        self.rows = []
+
+    def _pool(self, model):
+        h_params = {**model.h_params, "host": self.server.url}
+        scheduler_config = {**(model.api_info.get("scheduler") or {}), **self.scheduler_config}
+        return CompletionExecutorPool.from_config(h_params, scheduler_config)
+
+    async def scenario(
+        self, name: str, counter: str, latencies: list, coro, calls: int = None
+    ):
+        """
+        Runs one scenario. `calls` overrides the number of logical calls when it is
+        not the number of timed calls (e.g. one batch job scoring many rows).
+        """
+        before = self.server.stats[counter]
+        start = time.perf_counter()
+        await coro
+        elapsed = time.perf_counter() - start
+        upstream = self.server.stats[counter] - before
+        calls = len(latencies) if calls is None else calls
+        self.rows.append(
+            {
+                "scenario": name,
+                "calls": calls,
+                "wall_s": elapsed,
+                "rps": calls / elapsed if elapsed else 0,
+                "p50": percentile(latencies, 50),
+                "p95": percentile(latencies, 95),
+                "p99": percentile(latencies, 99),
+                "retries": upstream - calls,
+            }
+        )
+
+    async def kmle(self):
+        kmle = KMLE(use_cache=False)
+        await kmle.hcx.close()
+        kmle.hcx = self._pool(kmle)
+        latencies = []
+        kmle.hcx.execute_async = timed(kmle.hcx.execute_async, latencies)
+        await self.scenario(
+            "KMLE.run", "hcx_requests", latencies, kmle.run("bench", "bench_kmle")
+        )
+        await kmle.close()
+
+    async def banana(self):
+        punch = BananaPunch(gpt_key="mock", use_cache=False)
+        await punch.close()
+        punch.hcx = self._pool(punch)
+        punch.gpt = AsyncClient(
+            api_key="mock", base_url=self.server.url + "/v1", max_retries=0
+        )
+        punch.judge.client = punch.gpt
+
+        for section in punch.questions:
+            latencies = []
+            punch.hcx.execute_async = timed(punch.hcx.execute_async, latencies)
+            await self.scenario(
+                f"BananaPunch.run[{section}]",
+                "hcx_requests",
+                latencies,
+                punch.run(punch.prompts[section], section, f"bench_{section}"),
+            )
+
+        latencies = []
+        punch.judge.score = timed(punch.judge.score, latencies)
+        await self.scenario(
+            "BananaPunch.evaluate",
+            "openai_requests",
+            latencies,
+            punch.evaluate("bench_store_inquiry_handler"),
+        )
+
+        latencies = []
+        punch.judge.poll_interval = 0.5
+        punch.judge.score_batch = timed(punch.judge.score_batch, latencies)
+        await self.scenario(
+            "BananaPunch.evaluate(batch=True)",
+            "openai_batch_requests",
+            latencies,
+            punch.evaluate("bench_product_inquiry_handler", batch=True),
+            calls=len(punch.questions["product_inquiry_handler"]),
+        )
+        await punch.close()
+
+    async def tuning(self, n: int = 10):
+        latencies = []
+        create = timed(create_task, latencies)
+
+        async def run():
+            for i in range(n):
+                await asyncio.to_thread(create, f"bench_{i}", host=self.server.url)
+
+        await self.scenario("tuning.create_task", "tuning_requests", latencies, run())
+
+    async def storage(self, size_mb: int = 24):
+        """
+        Gzip multipart upload spanning several parts, then `generate_tuning_data`
+        with upload; both objects are read back from the mock and compared.
+        """
+        client = s3_client("mock", "mock", endpoint=self.server.url, max_connections=4)
+        # hex digits compress about 2:1, so the object spans several minimum-size parts
+        text = os.urandom(size_mb * 1024 * 1024 // 2).hex()
+
+        def upload():
+            raw = MultipartWriter(client, "bench", "bench.txt.gz", part_size=MIN_PART_SIZE)
+            raw._upload_part = timed(raw._upload_part, latencies)
+            f = open_text(raw, compress=True)
+            for i in range(0, len(text), 1 << 16):
+                f.write(text[i : i + (1 << 16)])
+            f.close()
+
+        latencies = []
+        await self.scenario(
+            "storage.MultipartWriter(gzip)",
+            "s3_parts",
+            latencies,
+            asyncio.to_thread(upload),
+        )
+        body = gzip.decompress(self.server.objects[("bench", "bench.txt.gz")])
+        assert len(latencies) >= 3, f"expected part rollover, got {len(latencies)} part(s)"
+        assert body.decode() == text, "uploaded object differs from what was written"
+
+        kmle = KMLE(use_cache=False)
+        await kmle.close()
+        kmle.api_info["storage"] = {
+            **(kmle.api_info.get("storage") or {}),
+            "endpoint": self.server.url,
+            "bucket": "bench",
+        }
+        latencies = []
+        generate = timed(kmle.generate_tuning_data, latencies)
+        await self.scenario(
+            "KMLE.generate_tuning_data(upload)",
+            "s3_uploads",
+            latencies,
+            asyncio.to_thread(generate, "bench", "bench_tuning", compress=True),
+        )
+        with open("tuning_data/bench_tuning.csv.gz", "rb") as f:
+            local = f.read()
+        assert self.server.objects[("bench", "bench_tuning.csv.gz")] == local, (
+            "uploaded tuning data differs from the local copy"
+        )
+        os.remove("tuning_data/bench_tuning.csv.gz")
+
+    def report(self):
+        print()
+        print(
+            f"{'scenario':<42}{'calls':>6}{'wall s':>8}{'req/s':>8}"
+            f"{'p50':>7}{'p95':>7}{'p99':>7}{'retries':>8}"
+        )
+        for row in self.rows:
+            print(
+                f"{row['scenario']:<42}{row['calls']:>6}{row['wall_s']:>8.2f}{row['rps']:>8.2f}"
+                f"{row['p50']:>7.2f}{row['p95']:>7.2f}{row['p99']:>7.2f}{row['retries']:>8}"
+            )
+        print(f"mock server: {dict(self.server.stats)}")
+
+
+async def main(args):
+    server = MockServer(
+        MockConfig(
+            latency=args.latency,
+            latency_mean=args.latency_mean,
+            latency_sigma=args.latency_sigma,
+            error_429=args.error_429,
+            error_500=args.error_500,
+        )
+    )
+    server.start()
+
+    scheduler_config = {}
+    if args.max_concurrency:
+        scheduler_config["max_concurrency"] = args.max_concurrency
+    if args.rate:
+        scheduler_config["rate"] = args.rate
+        scheduler_config["burst"] = max(1, int(args.rate))
+
+    bench = Bench(server, scheduler_config)
+    try:
+        await bench.kmle()
+        await bench.banana()
+        await bench.tuning()
+        await bench.storage()
+    finally:
+        server.stop()
+        for path in glob.glob("output/bench_*"):
+            os.remove(path)
+    bench.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="offline load-test benchmark")
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-mean", type=float, default=0.3)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-429", type=float, default=0.02)
+    parser.add_argument("--error-500", type=float, default=0.01)
+    parser.add_argument("--max-concurrency", type=int, help="override api_info.yaml scheduler")
+    parser.add_argument("--rate", type=float, help="override api_info.yaml scheduler (req/s per key)")
+    args = parser.parse_args()
+
+    asyncio.run(main(args))
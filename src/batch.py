@@ -0,0 +1,114 @@
+import asyncio
+import json
+import os
+
+import openai
+
+
+class BatchJob:
+    """
+    Offline job on the OpenAI Batch API.
+
+    Requests are written to a JSONL file, uploaded and submitted as one batch, and
+    the results are read back once the batch has finished. Batches run at a lower
+    price and do not count against the interactive rate limits, at the cost of
+    latency (minutes up to `completion_window`).
+    """
+
+    def __init__(
+        self,
+        client: openai.AsyncClient,
+        path: str,
+        endpoint: str = "/v1/chat/completions",
+        completion_window: str = "24h",
+        poll_interval: float = 30,
+    ):
+        self.client = client
+        self.path = path
+        self.endpoint = endpoint
+        self.completion_window = completion_window
+        self.poll_interval = poll_interval
+        self.batch_id = None
+
+    def write(self, requests: dict):
+        """
+        Writes the batch input file.
+
+        Args:
+            requests (dict): custom_id -> request body (e.g. model, messages, temperature).
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            for custom_id, body in requests.items():
+                line = {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": self.endpoint,
+                    "body": body,
+                }
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+    async def submit(self):
+        with open(self.path, "rb") as f:
+            batch_file = await self.client.files.create(file=f, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint=self.endpoint,
+            completion_window=self.completion_window,
+        )
+        self.batch_id = batch.id
+        print(f"Submitted batch {batch.id}.")
+        return batch.id
+
+    async def wait(self):
+        """
+        Polls the batch until it reaches a final state.
+
+        Raises:
+            ValueError: If the batch failed, expired or was cancelled.
+        """
+        while True:
+            batch = await self.client.batches.retrieve(self.batch_id)
+            if batch.status == "completed":
+                return batch
+            if batch.status in ["failed", "expired", "cancelled"]:
+                raise ValueError(f"Batch {self.batch_id} {batch.status}: {batch.errors}")
+            counts = batch.request_counts
+            if counts is not None:
+                print(f"Batch {batch.status}: {counts.completed}/{counts.total}.")
+            await asyncio.sleep(self.poll_interval)
+
+    async def results(self, batch):
+        """
+        Reads the output file of a finished batch.
+
+        Returns:
+            dict: custom_id -> response body, or None for requests that failed.
+        """
+        results = {}
+        for file_id in [batch.output_file_id, batch.error_file_id]:
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                response = item.get("response") or {}
+                if response.get("status_code") == 200:
+                    results[item["custom_id"]] = response["body"]
+                else:
+                    results.setdefault(item["custom_id"], None)
+        return results
+
+    async def run(self, requests: dict):
+        """
+        Writes, submits and waits for the batch.
+
+        Returns:
+            dict: custom_id -> response body, or None for requests that failed.
+        """
+        self.write(requests)
+        await self.submit()
+        batch = await self.wait()
+        return await self.results(batch)
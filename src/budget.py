@@ -0,0 +1,145 @@
+import re
+
+
+_HANGUL = re.compile(r"[가-힣]")
+_WORD = re.compile(r"[A-Za-z]+")
+_OTHER = re.compile(r"[^\sA-Za-z가-힣]")
+
+
+def estimate_tokens(text: str):
+    """
+    Approximates the HCX token count of `text` without a tokenizer.
+
+    Roughly 0.7 tokens per Hangul syllable, 1.3 per English word and one per digit
+    or symbol; close enough to size `maxTokens` and rate windows.
+    """
+    if not text:
+        return 0
+    hangul = len(_HANGUL.findall(text))
+    words = len(_WORD.findall(text))
+    other = len(_OTHER.findall(text))
+    return int(hangul * 0.7 + words * 1.3 + other) + 1
+
+
+def request_tokens(completion_request: dict):
+    """
+    Estimated token cost of one request: prompt tokens plus the `maxTokens` it may use.
+    """
+    prompt = sum(
+        estimate_tokens(m["content"]) for m in completion_request.get("messages", [])
+    )
+    return prompt + completion_request.get("maxTokens", 0)
+
+
+class TokenBudget:
+    """
+    Per-task completion budgets and pre-run cost/time projection.
+
+    `max_tokens` maps a task (`kmle` or a banana section) to the `maxTokens` it is
+    sent with; tasks without an entry use `default`. `project` estimates tokens,
+    cost and wall-clock time of a run from the prompts alone, using the scheduler
+    limits to bound throughput.
+    """
+
+    def __init__(
+        self,
+        max_tokens: dict = None,
+        default: int = 256,
+        price_input: float = 5.0,
+        price_output: float = 5.0,
+        first_token_latency: float = 0.5,
+        output_tokens_per_sec: float = 40,
+    ):
+        self._max_tokens = max_tokens or {}
+        self.default = default
+        self.price_input = price_input
+        self.price_output = price_output
+        self.first_token_latency = first_token_latency
+        self.output_tokens_per_sec = output_tokens_per_sec
+
+    @classmethod
+    def from_config(cls, config: dict, default: int = 256):
+        """
+        Builds a budget from the `budget` section of api_info.yaml.
+
+        Args:
+            default (int): `maxTokens` of tasks not listed (the `colab` max_tokens).
+        """
+        config = config or {}
+        price = config.get("price_per_1k_tokens", {})
+        return cls(
+            max_tokens=config.get("max_tokens"),
+            default=default,
+            price_input=price.get("input", 5.0),
+            price_output=price.get("output", 5.0),
+            first_token_latency=config.get("first_token_latency", 0.5),
+            output_tokens_per_sec=config.get("output_tokens_per_sec", 40),
+        )
+
+    def max_tokens(self, task: str):
+        return self._max_tokens.get(task, self.default)
+
+    def project(self, prompts: list, max_tokens: int, scheduler_config: dict, keys: int = 1):
+        """
+        Projects one run over `prompts` (system + user text of every request).
+
+        Completion tokens are counted at `max_tokens`, so tokens, cost and time are
+        upper bounds. Time is the slowest of the concurrency, request-rate and
+        token-rate limits of `keys` credentials.
+
+        Returns:
+            dict: requests, input_tokens, output_tokens, cost and seconds.
+        """
+        scheduler_config = scheduler_config or {}
+        n = len(prompts)
+        input_tokens = sum(estimate_tokens(p) for p in prompts)
+        output_tokens = n * max_tokens
+
+        latency = self.first_token_latency + max_tokens / self.output_tokens_per_sec
+        seconds = n * latency / (scheduler_config.get("max_concurrency", 10) * keys)
+        seconds = max(seconds, n / (scheduler_config.get("rate", 5.0) * keys))
+        tokens_per_minute = scheduler_config.get("tokens_per_minute")
+        if tokens_per_minute:
+            seconds = max(
+                seconds, (input_tokens + output_tokens) / (tokens_per_minute * keys / 60)
+            )
+
+        return {
+            "requests": n,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost": (
+                input_tokens * self.price_input + output_tokens * self.price_output
+            )
+            / 1000,
+            "seconds": seconds,
+        }
+
+    def dry_run(
+        self,
+        system_prompt: str,
+        user_prompts: list,
+        max_tokens: int,
+        scheduler_config: dict,
+        keys: int = 1,
+    ):
+        """
+        Prints and returns the projection of a run without sending anything.
+        """
+        projection = self.project(
+            [system_prompt + prompt for prompt in user_prompts],
+            max_tokens,
+            scheduler_config,
+            keys,
+        )
+        self.report(projection)
+        return projection
+
+    @staticmethod
+    def report(projection: dict):
+        minutes, seconds = divmod(int(projection["seconds"]), 60)
+        print(
+            f"Dry run: {projection['requests']} requests, "
+            f"~{projection['input_tokens']} input + ≤{projection['output_tokens']} output tokens, "
+            f"≤{projection['cost']:.1f}원, ≤{minutes}m {seconds}s"
+        )
@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    On-disk response cache keyed by a hash of the model name and the full request body.
+
+    Entries older than `max_age` seconds are dropped, and once the cache holds more
+    than `max_entries` rows the oldest ones are evicted. Set `enabled` to False to
+    bypass it (nothing is read or written, and the database is never opened).
+
+    The database is opened on first use. Writes are handed to a background thread
+    that commits whatever has queued up in one transaction, so `set` never blocks
+    the event loop on disk I/O; until then the entry is served from memory.
+    """
+
+    def __init__(
+        self,
+        path: str = "output/cache.sqlite",
+        max_entries: int = 100000,
+        max_age: float = 7 * 24 * 3600,
+        enabled: bool = True,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.enabled = enabled
+
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = None
+        self._queue = None
+        self._writer = None
+        self._pending = {}  # key -> (value, created) not yet committed
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: dict, enabled: bool = True):
+        """
+        Builds a cache from the `cache` section of api_info.yaml.
+
+        Args:
+            enabled (bool): False disables the cache whatever the config says.
+        """
+        config = config or {}
+        return cls(
+            path=config.get("path", "output/cache.sqlite"),
+            max_entries=config.get("max_entries", 100000),
+            max_age=config.get("max_age_days", 7) * 24 * 3600,
+            enabled=enabled and config.get("enabled", True),
+        )
+
+    def _connect(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            # readers are not blocked by the writer thread's transactions
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_created ON responses (created)"
+            )
+            conn.commit()
+            self._conn = conn
+            self._queue = queue.SimpleQueue()
+            self._writer = threading.Thread(target=self._run, daemon=True)
+            self._writer.start()
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, request: dict):
+        body = json.dumps(
+            {"model": model, "request": request}, sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+    def get(self, model: str, request: dict):
+        """
+        Returns the cached response, or None on a miss.
+        """
+        if not self.enabled:
+            return None
+        key = self.make_key(model, request)
+        with self._lock:
+            row = self._pending.get(key)
+        if row is None:
+            row = (
+                self._connect()
+                .execute("SELECT value, created FROM responses WHERE key = ?", (key,))
+                .fetchone()
+            )
+        if row is None or time.time() - row[1] > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, model: str, request: dict, value):
+        if not self.enabled:
+            return
+        self._connect()
+        key = self.make_key(model, request)
+        row = (json.dumps(value, ensure_ascii=False), time.time())
+        with self._lock:
+            self._pending[key] = row
+        self._queue.put((key, *row))
+
+    def _run(self):
+        conn = sqlite3.connect(self.path)
+        # startup eviction can scan a large table; keep it off the caller's thread
+        self._evict(conn)
+        writes = 0
+        while True:
+            rows = [self._queue.get()]
+            while not self._queue.empty():
+                rows.append(self._queue.get())
+            stop = rows[-1] is None
+            rows = [row for row in rows if row is not None]
+            if rows:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO responses (key, value, created) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+                conn.commit()
+                with self._lock:
+                    for key, *row in rows:
+                        if self._pending.get(key) == tuple(row):
+                            del self._pending[key]
+                if (writes + len(rows)) // 1000 > writes // 1000:
+                    self._evict(conn)
+                writes += len(rows)
+            if stop:
+                conn.close()
+                return
+
+    def _evict(self, conn):
+        conn.execute(
+            "DELETE FROM responses WHERE created < ?", (time.time() - self.max_age,)
+        )
+        conn.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        conn.commit()
+
+    def evict(self):
+        self._evict(self._connect())
+
+    def clear(self):
+        self.close()
+        conn = self._connect()
+        conn.execute("DELETE FROM responses")
+        conn.commit()
+
+    def report(self, reset: bool = True):
+        """
+        Prints the hit rate since the last report.
+        """
+        total = self.hits + self.misses
+        if self.enabled and total:
+            print(f"Cache hit rate: {self.hits}/{total} ({self.hits / total:.1%})")
+        if reset:
+            self.hits = 0
+            self.misses = 0
+
+    def close(self):
+        """
+        Waits for the queued writes to be committed and closes the database; it is
+        reopened on the next use.
+        """
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,184 @@
+import json
+import mmap
+import os
+import random
+
+import numpy as np
+
+
+INDEX_DTYPE = np.dtype(
+    [
+        ("offset", "<u8"),
+        ("length", "<u4"),
+        ("category", "<u2"),
+        ("year", "<u2"),
+        ("session", "u1"),
+        ("has_picture", "?"),
+        ("withheld", "?"),
+    ]
+)
+
+
+def _build_index(path: str):
+    rows = []
+    categories = []
+    category_ids = {}
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            if line.strip():
+                item = json.loads(line)
+                category = item["problem_category"]
+                if category not in category_ids:
+                    category_ids[category] = len(categories)
+                    categories.append(category)
+                has_picture = bool(item["has_picture"]) and item["has_picture"] != "no"
+                rows.append(
+                    (
+                        offset,
+                        len(line),
+                        category_ids[category],
+                        int(item.get("year") or 0),
+                        int(item.get("session") or 0),
+                        has_picture,
+                        "비공개" in item["answer"],
+                    )
+                )
+            offset += len(line)
+    return np.array(rows, dtype=INDEX_DTYPE), categories
+
+
+def _load_index(path: str):
+    """
+    Loads the index of `path`, (re)building it when the data file changed.
+    """
+    index_path = path + ".idx.npy"
+    meta_path = path + ".idx.json"
+    stat = os.stat(path)
+
+    if os.path.exists(index_path) and os.path.exists(meta_path):
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["mtime_ns"] == stat.st_mtime_ns and meta["size"] == stat.st_size:
+            return np.load(index_path, mmap_mode="r"), meta["categories"]
+
+    index, categories = _build_index(path)
+    try:
+        np.save(index_path, index)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "categories": categories,
+                },
+                f,
+                ensure_ascii=False,
+            )
+    except OSError:
+        # read-only data directory: keep the index in memory
+        return index, categories
+    return np.load(index_path, mmap_mode="r"), categories
+
+
+class KMLEDataset:
+    """
+    Lazily loaded view over `data/kmle_{year}.jsonl`.
+
+    A compact binary index (byte offset, category, year, session, picture flags)
+    is built once next to the data file and rebuilt when the file's mtime or size
+    changes. Records are decoded from a memory-mapped file only when accessed, so
+    filtering and sampling never parse the whole corpus. Use it as a context
+    manager (or call `close`) to release the mapped files.
+    """
+
+    def __init__(
+        self, year: str = "2024", data_dir: str = "data", _rows=None, _parent=None
+    ):
+        if _parent is not None:
+            self.path = _parent.path
+            self._index = _parent._index
+            self.categories = _parent.categories
+            self._mmap = _parent._mmap
+        else:
+            self.path = os.path.join(data_dir, f"kmle_{year}.jsonl")
+            self._index, self.categories = _load_index(self.path)
+            with open(self.path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._rows = np.arange(len(self._index)) if _rows is None else _rows
+
+    def _view(self, rows):
+        return KMLEDataset(_rows=rows, _parent=self)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, idx: int):
+        row = self._index[self._rows[idx]]
+        start = int(row["offset"])
+        return json.loads(self._mmap[start : start + int(row["length"])])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def filter(self, category: str = None, session: int = None, usable: bool = False):
+        """
+        Returns a filtered view.
+
+        Args:
+            category (str): Keep only this problem_category.
+            session (int): Keep only this exam session.
+            usable (bool): Drop questions that have a picture and a withheld ("비공개") answer.
+        """
+        index = self._index[self._rows]
+        mask = np.ones(len(self._rows), dtype=bool)
+        if category is not None:
+            if category not in self.categories:
+                return self._view(self._rows[:0])
+            mask &= index["category"] == self.categories.index(category)
+        if session is not None:
+            mask &= index["session"] == int(session)
+        if usable:
+            mask &= ~(index["has_picture"] & index["withheld"])
+        return self._view(self._rows[mask])
+
+    def category_of(self, idx: int):
+        return self.categories[int(self._index[self._rows[idx]]["category"])]
+
+    def stratified_sample(self, per_category: int = 6, seed: int = 42):
+        """
+        Samples up to `per_category` questions from every category.
+
+        Categories are visited in order of first appearance with one seeded RNG, so
+        the result is the same sample the old `load_kmle` produced.
+        """
+        rng = random.Random(seed)
+        categories = self._index[self._rows]["category"]
+        _, first = np.unique(categories, return_index=True)
+        order = categories[np.sort(first)]
+
+        rows = []
+        for category in order:
+            members = self._rows[categories == category].tolist()
+            rows.extend(rng.sample(members, min(per_category, len(members))))
+        return self._view(np.array(rows, dtype=self._rows.dtype))
+
+    def to_list(self):
+        return list(self)
+
+    def close(self):
+        """
+        Unmaps the data file and drops the memory-mapped index. Views share them
+        with the dataset they came from, so they are closed as well.
+        """
+        if not self._mmap.closed:
+            self._mmap.close()
+        # np.memmap has no close(); it is unmapped once the last reference is gone
+        self._index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import json
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_SPACES = re.compile(r"\s+")
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize(text: str):
+    """
+    NFKC, lower case, no punctuation, single spaces.
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    text = _PUNCTUATION.sub(" ", text)
+    return _SPACES.sub(" ", text).strip()
+
+
+class MinHash:
+    """
+    MinHash signatures of character shingles with an LSH band index.
+
+    Two texts share a band bucket with high probability when the Jaccard
+    similarity of their shingle sets is high; `similarity` estimates it from the
+    fraction of equal signature entries.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, shingle: int = 3, seed: int = 42):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rng = np.random.default_rng(seed)
+        # a < 2**31 keeps a * x + b below 2**64 for 32-bit shingle hashes
+        self._a = rng.integers(1, 2**31, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**31, num_perm, dtype=np.uint64)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle = shingle
+
+    def signature(self, text: str):
+        n = self.shingle
+        shingles = {text[i : i + n] for i in range(max(1, len(text) - n + 1))}
+        x = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles),
+            dtype=np.uint64,
+            count=len(shingles),
+        )
+        return ((np.outer(x, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def band_keys(self, signature: np.ndarray):
+        return [
+            (band, signature[band * self.rows : (band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray):
+        return float(np.mean(a == b))
+
+
+class DedupExecutor:
+    """
+    Deduplication stage in front of a `CompletionExecutor` or pool.
+
+    Requests are keyed by their normalized messages and sampling parameters.
+    A request identical to one already in flight waits for that request instead of
+    sending its own (single-flight), and one identical to a finished request reuses
+    its answer. With `threshold` set, the last user message is also matched by
+    MinHash against earlier requests with the same system prompt and parameters,
+    and an answer is reused when the estimated similarity is at least `threshold`.
+    Failed requests are never reused.
+
+    Every other attribute (streaming, `close`, ...) is passed through to the
+    wrapped executor.
+    """
+
+    def __init__(
+        self,
+        executor,
+        threshold: float = None,
+        num_perm: int = 128,
+        bands: int = 32,
+        shingle: int = 3,
+    ):
+        self.executor = executor
+        self.threshold = threshold
+        self.minhash = MinHash(num_perm, bands, shingle) if threshold else None
+
+        self._results = {}  # exact key -> answer, or future while in flight
+        self._signatures = {}  # exact key -> (context, signature)
+        self._buckets = {}  # (context, band key) -> [exact key, ...]
+        self.stats = {"requests": 0, "exact": 0, "coalesced": 0, "near": 0}
+
+    @classmethod
+    def from_config(cls, executor, config: dict):
+        """
+        Wraps `executor` as configured in the `dedup` section of api_info.yaml.
+        """
+        config = config or {}
+        return cls(
+            executor,
+            threshold=config.get("near_threshold"),
+            num_perm=config.get("num_perm", 128),
+            bands=config.get("bands", 32),
+        )
+
+    def __getattr__(self, name):
+        return getattr(self.executor, name)
+
+    @staticmethod
+    def _keys(completion_request: dict):
+        messages = completion_request.get("messages", [])
+        params = {k: v for k, v in completion_request.items() if k != "messages"}
+        context = json.dumps(
+            [
+                [m["role"], normalize(m["content"])]
+                for m in messages[:-1]
+            ]
+            + [params],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        last = normalize(messages[-1]["content"]) if messages else ""
+        exact = hashlib.sha256((context + "\x00" + last).encode("utf-8")).hexdigest()
+        return exact, hashlib.sha256(context.encode("utf-8")).hexdigest(), last
+
+    def _near(self, context: str, signature: np.ndarray):
+        best, best_similarity = None, self.threshold
+        for band_key in self.minhash.band_keys(signature):
+            for key in self._buckets.get((context, band_key), []):
+                similarity = MinHash.similarity(signature, self._signatures[key][1])
+                if similarity >= best_similarity:
+                    best, best_similarity = key, similarity
+        return best
+
+    def _index(self, key: str, context: str, signature: np.ndarray):
+        self._signatures[key] = (context, signature)
+        for band_key in self.minhash.band_keys(signature):
+            self._buckets.setdefault((context, band_key), []).append(key)
+
+    def _forget(self, key: str):
+        self._results.pop(key, None)
+        if key in self._signatures:
+            context, signature = self._signatures.pop(key)
+            for band_key in self.minhash.band_keys(signature):
+                self._buckets[(context, band_key)].remove(key)
+
+    def _in_flight(self, key: str):
+        return isinstance(self._results[key], asyncio.Future)
+
+    async def _wait(self, key: str):
+        if self._in_flight(key):
+            return await asyncio.shield(self._results[key])
+        return self._results[key]
+
+    async def execute_async(self, completion_request):
+        self.stats["requests"] += 1
+        key, context, last = self._keys(completion_request)
+
+        if key in self._results:
+            self.stats["coalesced" if self._in_flight(key) else "exact"] += 1
+            return await self._wait(key)
+
+        signature = None
+        if self.minhash is not None:
+            signature = self.minhash.signature(last)
+            match = self._near(context, signature)
+            if match is not None:
+                self.stats["near"] += 1
+                return await self._wait(match)
+
+        future = asyncio.get_running_loop().create_future()
+        self._results[key] = future
+        if signature is not None:
+            self._index(key, context, signature)
+        try:
+            message = await self.executor.execute_async(completion_request)
+        except BaseException as e:
+            self._forget(key)
+            if isinstance(e, Exception):
+                future.set_exception(e)
+                # retrieved here so a future nobody waited on does not warn
+                future.exception()
+            else:
+                future.cancel()
+            raise
+
+        future.set_result(message)
+        if "content" in message:
+            # keep the plain answer: a future is bound to the event loop it came from
+            self._results[key] = message
+        else:
+            self._forget(key)
+        return message
+
+    def report(self, reset: bool = True):
+        requests = self.stats["requests"]
+        reused = self.stats["exact"] + self.stats["coalesced"] + self.stats["near"]
+        if requests:
+            print(
+                f"Dedup: {reused}/{requests} requests reused ({reused / requests:.1%}; "
+                f"exact {self.stats['exact']}, in-flight {self.stats['coalesced']}, "
+                f"near {self.stats['near']})"
+            )
+        if reset:
+            self.stats = dict.fromkeys(self.stats, 0)
@@ -0,0 +1,140 @@
+import asyncio
+import json
+import os
+import queue
+import threading
+
+
+class Journal:
+    """
+    Append-only JSONL journal of finished responses for one run.
+
+    The first line holds the run's metadata (system prompt, section, ...); every
+    following line is one `{"idx": ..., "value": ...}` record, flushed to disk as
+    soon as the response arrives. A crashed run can then be resumed by skipping
+    the indices already in the journal.
+
+    Records are written and fsynced by a background thread, so `append` never
+    blocks the event loop on disk I/O; records that arrive while a sync is running
+    are committed together by the next one. If writing fails (disk full, I/O
+    error), the writer stops and the error is raised by the next `append` and by
+    `close`, so a run never silently loses journal records.
+    """
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.meta = meta
+        self._f = None
+        self._queue = None
+        self._writer = None
+        self._error = None
+
+    def load(self):
+        """
+        Reads the finished records.
+
+        Returns:
+            dict: idx -> value. Empty if the journal does not exist.
+
+        Raises:
+            ValueError: If the journal was written for a different run.
+        """
+        if not os.path.exists(self.path):
+            return {}
+
+        done = {}
+        with open(self.path, "r", encoding="utf-8") as f:
+            header = f.readline()
+            if not header.strip():
+                return {}
+            if json.loads(header) != self.meta:
+                raise ValueError(
+                    f"{self.path} belongs to a different run "
+                    "(system prompt or data changed). Use resume=False to start over."
+                )
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # torn last line from a crash
+                    continue
+                done[record["idx"]] = record["value"]
+        return done
+
+    def open(self, resume: bool = False):
+        """
+        Opens the journal for appending.
+
+        Args:
+            resume (bool): Keep the existing records instead of starting a new journal.
+
+        Returns:
+            dict: idx -> value of the records that are already finished.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        done = self.load() if resume else {}
+        if done:
+            self._drop_torn_line()
+            self._f = open(self.path, "a", encoding="utf-8")
+        else:
+            self._f = open(self.path, "w", encoding="utf-8")
+            self._write([self.meta])
+        self._queue = queue.SimpleQueue()
+        self._error = None
+        self._writer = threading.Thread(target=self._run, daemon=True)
+        self._writer.start()
+        return done
+
+    def _drop_torn_line(self):
+        # a record torn by a crash would swallow the first appended one
+        with open(self.path, "rb+") as f:
+            data = f.read()
+            end = data.rfind(b"\n") + 1
+            if end < len(data):
+                f.truncate(end)
+
+    def _write(self, records: list):
+        self._f.write(
+            "".join(json.dumps(data, ensure_ascii=False) + "\n" for data in records)
+        )
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def _run(self):
+        while True:
+            records = [self._queue.get()]
+            while not self._queue.empty():
+                records.append(self._queue.get())
+            stop = records[-1] is None
+            records = [data for data in records if data is not None]
+            try:
+                if records:
+                    self._write(records)
+            except Exception as e:
+                self._error = e
+                return
+            if stop:
+                return
+
+    def append(self, idx: int, value):
+        if self._error is not None:
+            raise self._error
+        self._queue.put({"idx": idx, "value": value})
+
+    async def close(self):
+        """
+        Waits (off the event loop) for the queued records to be on disk and closes
+        the file.
+
+        Raises:
+            OSError: If the background writer failed.
+        """
+        if self._writer is not None:
+            self._queue.put(None)
+            await asyncio.to_thread(self._writer.join)
+            self._writer = None
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,206 @@
+import asyncio
+import random
+import re
+
+import openai
+
+from src.batch import BatchJob
+from src.cache import ResponseCache
+from src.scheduler import Scheduler
+
+
+SCORE_PATTERN = re.compile(r"score\s*[:：]?\s*\**\s*(\d+)", re.IGNORECASE)
+NUMBER_PATTERN = re.compile(r"\b(\d+)\b")
+
+REASK_PROMPT = "출력 포멧을 지키지 않았습니다. 다른 말은 추가하지 말고 'score: 정수' 형식으로만 다시 작성해"
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def extract_score(text: str, low: int = 1, high: int = 10):
+    """
+    Extracts the score from a judge reply.
+
+    Looks for `score: n` first and falls back to a reply that is a single number.
+
+    Returns:
+        int: The score, or None if the reply holds no score in [low, high].
+    """
+    if not isinstance(text, str):
+        return None
+    match = SCORE_PATTERN.findall(text)
+    if not match:
+        match = NUMBER_PATTERN.findall(text)
+        if len(match) != 1:
+            return None
+    score = int(match[-1])
+    if low <= score <= high:
+        return score
+    return None
+
+
+class Judge:
+    """
+    LLM-as-a-judge scorer with bounded concurrency, retries and re-asking.
+
+    Requests go through a `Scheduler`, so at most `max_in_flight` are in flight and
+    rate-limit errors shrink the window. Rate-limit, timeout, connection and 5xx
+    errors are retried with exponential back-off and full jitter; a reply without
+    a valid score is re-asked `reask` times. Errors are returned per row instead
+    of aborting the whole evaluation.
+    """
+
+    def __init__(
+        self,
+        client: openai.AsyncClient,
+        cache: ResponseCache = None,
+        model: str = "gpt-4o-mini",
+        max_in_flight: int = 8,
+        rate: float = 10.0,
+        max_retries: int = 5,
+        reask: int = 1,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+        poll_interval: float = 30,
+    ):
+        self.client = client
+        self.cache = cache
+        self.model = model
+        self.scheduler = Scheduler(
+            max_concurrency=max_in_flight, rate=rate, burst=max_in_flight
+        )
+        self.max_retries = max_retries
+        self.reask = reask
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+
+    @classmethod
+    def from_config(cls, client: openai.AsyncClient, config: dict, cache=None):
+        """
+        Builds a judge from the `judge` section of api_info.yaml.
+        """
+        config = config or {}
+        return cls(
+            client,
+            cache=cache,
+            model=config.get("model", "gpt-4o-mini"),
+            max_in_flight=config.get("max_in_flight", 8),
+            rate=config.get("rate", 10.0),
+            max_retries=config.get("max_retries", 5),
+            reask=config.get("reask", 1),
+            poll_interval=config.get("batch_poll_interval", 30),
+        )
+
+    @staticmethod
+    def _request_data(messages: list):
+        return {"messages": messages, "temperature": 0.1, "max_tokens": 256}
+
+    async def _complete(self, messages: list):
+        request_data = self._request_data(messages)
+        if self.cache is not None:
+            cached = self.cache.get(self.model, request_data)
+            if cached is not None:
+                return cached
+
+        attempt = 0
+        while True:
+            try:
+                async with self.scheduler.slot():
+                    completion = await self.client.chat.completions.create(
+                        model=self.model, **request_data
+                    )
+                self.scheduler.report("20000")
+                break
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, openai.RateLimitError):
+                    self.scheduler.report("42900")
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = min(self.max_delay, self.base_delay * 2**attempt)
+                await asyncio.sleep(random.uniform(0, delay))
+
+        content = completion.choices[0].message.content
+        if self.cache is not None:
+            self.cache.set(self.model, request_data, content)
+        return content
+
+    async def score(self, prompt: str):
+        """
+        Scores one evaluation prompt.
+
+        Returns:
+            dict: {"score": int or None, "raw": last reply, "error": error message or None}
+        """
+        messages = [{"role": "user", "content": prompt}]
+        raw = None
+        try:
+            for _ in range(self.reask + 1):
+                raw = await self._complete(messages)
+                score = extract_score(raw)
+                if score is not None:
+                    return {"score": score, "raw": raw, "error": None}
+                messages = messages + [
+                    {"role": "assistant", "content": raw or ""},
+                    {"role": "user", "content": REASK_PROMPT},
+                ]
+            return {"score": None, "raw": raw, "error": "no score in reply"}
+        except Exception as e:
+            return {"score": None, "raw": raw, "error": f"{type(e).__name__}: {e}"}
+
+    async def score_batch(self, prompts: list, path: str):
+        """
+        Scores prompts through the OpenAI Batch API instead of interactive calls.
+
+        Cached prompts are not resubmitted. Rows that failed in the batch or whose
+        reply holds no valid score are re-scored interactively with `score`.
+
+        Args:
+            prompts (list): Evaluation prompts.
+            path (str): Where to write the batch input JSONL file.
+
+        Returns:
+            list: One dict per prompt, like `score` returns.
+        """
+        results = [None] * len(prompts)
+        requests = {}
+        for idx, prompt in enumerate(prompts):
+            request_data = self._request_data([{"role": "user", "content": prompt}])
+            cached = None
+            if self.cache is not None:
+                cached = self.cache.get(self.model, request_data)
+            if extract_score(cached) is not None:
+                results[idx] = {"score": extract_score(cached), "raw": cached, "error": None}
+            else:
+                requests[str(idx)] = {"model": self.model, **request_data}
+
+        if requests:
+            job = BatchJob(self.client, path, poll_interval=self.poll_interval)
+            output = await job.run(requests)
+            for custom_id, body in output.items():
+                if body is None:
+                    continue
+                idx = int(custom_id)
+                raw = body["choices"][0]["message"]["content"]
+                score = extract_score(raw)
+                if score is None:
+                    continue
+                results[idx] = {"score": score, "raw": raw, "error": None}
+                if self.cache is not None:
+                    request_data = requests[custom_id].copy()
+                    request_data.pop("model")
+                    self.cache.set(self.model, request_data, raw)
+
+        retry = [idx for idx, result in enumerate(results) if result is None]
+        if retry:
+            print(f"Re-scoring #{len(retry)} rows interactively.")
+            scored = await asyncio.gather(*[self.score(prompts[idx]) for idx in retry])
+            for idx, result in zip(retry, scored):
+                results[idx] = result
+        return results
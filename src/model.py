@@ -1,32 +1,93 @@
 import http.client
 import base64
+import hashlib
+import io
 import json, jsonlines
 import asyncio
 import os
 import re
 import csv
+import time
+from contextlib import aclosing, nullcontext
 
-import boto3
+import aiohttp
 import requests
 import pandas as pd
 from openai import AsyncClient
 
+from src.budget import TokenBudget, request_tokens
+from src.cache import ResponseCache
+from src.dedup import DedupExecutor
+from src.journal import Journal
+from src.judge import Judge
+from src.output import PostProcessor, write_frame
+from src.prompt import compile_template, load_prompts, prompt_set
+from src.response import (
+    CompletionError,
+    CompletionResult,
+    decode_completion,
+    decode_json,
+)
+from src.scheduler import Scheduler, gather_tasks
+from src.scoring import ANSWER_PATTERN, accuracy_by, score_predictions
+from src.storage import MultipartWriter, TeeWriter, open_text, s3_client
+from src.trace import Tracer
 from src.util import load_questions, load_yaml, load_kmle
 
 
+def _score_results(kmle: list, message: list):
+    # module-level so it can run in a process pool
+    return score_predictions(KMLE._result_frame(kmle, message))
+
+
 class KMLE:
-    def __init__(self, api_key: str, primary_val: str, request_id: str):
+    def __init__(
+        self,
+        api_key: str = None,
+        primary_val: str = None,
+        request_id: str = None,
+        use_cache: bool = True,
+    ):
+        """
+        Args:
+            api_key, primary_val, request_id: A single HCX credential triple. When
+                omitted, requests are spread across every credential listed in the
+                `colab` section of api_info.yaml.
+            use_cache (bool): Set to False to bypass the response cache.
+        """
         self.kmle = load_kmle()
         self.prompts = self._set_prompt()
         self.api_info = load_yaml("api_info.yaml")
         self.h_params = self.api_info["colab"]
 
-        self.hcx = CompletionExecutor(
-            host=self.h_params["host"],
-            api_key=api_key,
-            api_key_primary_val=primary_val,
-            request_id=request_id,
+        scheduler_config = self.api_info.get("scheduler")
+        self.cache = ResponseCache.from_config(
+            self.api_info.get("cache"), enabled=use_cache
+        )
+        self.tracer = Tracer.from_config(self.api_info.get("trace"))
+        self.post = PostProcessor.from_config(self.api_info.get("output"))
+        self.budget = TokenBudget.from_config(
+            self.api_info.get("budget"), self.h_params["max_tokens"]
         )
+        self.max_tokens = self.budget.max_tokens("kmle")
+
+        if api_key is None:
+            self.hcx = CompletionExecutorPool.from_config(
+                self.h_params, scheduler_config, cache=self.cache, tracer=self.tracer
+            )
+        else:
+            self.hcx = CompletionExecutor(
+                host=self.h_params["host"],
+                api_key=api_key,
+                api_key_primary_val=primary_val,
+                request_id=request_id,
+                scheduler=Scheduler.from_config(scheduler_config),
+                cache=self.cache,
+                tracer=self.tracer,
+            )
+        dedup_config = self.api_info.get("dedup") or {}
+        if dedup_config.get("enabled", False):
+            self.hcx = DedupExecutor.from_config(self.hcx, dedup_config)
 
     def show_questions(self):
         return pd.DataFrame(self.kmle)[
@@ -52,131 +113,182 @@ class KMLE:
         }
         return self.hcx.execute(request_data) # ["content"]
 
-    async def run_test(self, system_prompt: str, start: int, end: int):
-        ans_pattern = r"\((\d+)\)"
-        message = []
+    async def run_test(
+        self,
+        system_prompt: str,
+        start: int = 0,
+        end: int = None,
+        stream: bool = False,
+        indices: list = None,
+    ):
+        """
+        Runs a subset of the questions without writing any file.
+
+        Args:
+            system_prompt (str): A string containing the system prompt that needs to be processed.
+            start (int): First question index.
+            end (int): Last question index (inclusive); defaults to the last question.
+            stream (bool): Use the streaming endpoint (see `run`).
+            indices (list): Question indices to run instead of the `start`-`end` range.
+
+        Returns:
+            df: Scored results of the selected questions.
+        """
+        if indices is None:
+            end = len(self.prompts) - 1 if end is None else end
+            indices = range(start, end + 1)
+        stream_stats = []
 
-        async def execute_request(prompt: str):
+        async def execute_request(idx: int, prompt: str):
             request_data = {
                 "messages": [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt},
                 ],
-                "maxTokens": self.h_params["max_tokens"],
+                "maxTokens": self.max_tokens,
                 "topP": self.h_params["top_p"],
                 "temperature": self.h_params["temperature"],
                 "repeatPenalty": self.h_params["repeat_penalty"],
             }
-            response_text = await self.hcx.execute_async(request_data)
+            response_text = await self._execute(idx, request_data, stream, stream_stats)
             if "content" in response_text:
                 return response_text["content"]
 
-        tasks = [
-            execute_request(prompt)
-            for _, prompt in enumerate(self.prompts[start : end + 1])
-        ]
+        tasks = [execute_request(idx, self.prompts[idx]) for idx in indices]
 
-        for i in range(0, len(tasks), 5):
-            print(f"Started generating #{i}.")
-            result = await asyncio.gather(*tasks[i : i + 5])
-            message.extend(result)
-            await asyncio.sleep(1)
+        message = await gather_tasks(tasks)
+        if stream:
+            StreamStats.report(stream_stats)
 
-        df = pd.DataFrame(
-            {
-                "question": [data["question"] for data in self.kmle[start : end + 1]],
-                "options": [data["options"] for data in self.kmle[start : end + 1]],
-                "answer": [
-                    data["answer_idx"][0] for data in self.kmle[start : end + 1]
-                ],
-                "pred_ori": message,
-            }
-        )
-
-        df["pred"] = df["pred_ori"].apply(
-            lambda answer: (
-                re.search(ans_pattern, answer).group(1)
-                if re.search(ans_pattern, answer)
-                else 0
-            )
+        df = await self.post.run(
+            _score_results, [self.kmle[idx] for idx in indices], message
         )
-
-        score = (df["pred"] == df["answer"]).sum()
-        print(f"점수: {score}")
+        print(f"점수: {df['correct'].sum()}")
+        self.cache.report()
 
         return df
 
-    async def run(self, system_prompt: str, file_name: str):
+    async def run(
+        self,
+        system_prompt: str,
+        file_name: str,
+        resume: bool = False,
+        stream: bool = False,
+        dry_run: bool = False,
+    ):
         """
         Generates results for a given set of questions using prompts, and outputs the results as an Excel file.
 
+        Each response is appended to `output/{file_name}.journal.jsonl` as soon as it arrives,
+        and per-request spans go to `output/{file_name}.trace.jsonl`.
+
         Args:
             system_prompt (str): A string containing the system prompt that needs to be processed.
-            file_name (str): The name of the Excel file where the results will be saved.
+            file_name (str): The name of the result file: `output/{file_name}.xlsx`, or `.parquet`
+                / `.csv` as set in the `output` section of api_info.yaml.
+            resume (bool): Skip the questions already recorded in the journal of an interrupted run.
+            stream (bool): Use the streaming endpoint and stop generating as soon as the answer
+                index has been written (questions with several answers run to the end).
+                Time-to-first-token and tokens/s are reported.
+            dry_run (bool): Only print the projected tokens, cost and time of the run.
 
         Returns:
-            df: generated Excel file containing the results.
+            df: generated Excel file containing the results (the projection for a dry run).
         """
+        if dry_run:
+            return self.budget.dry_run(
+                system_prompt,
+                self.prompts,
+                self.max_tokens,
+                self.api_info.get("scheduler"),
+                keys=len(getattr(self.hcx, "executors", [self.hcx])),
+            )
         os.makedirs("output", exist_ok=True)
-        ans_pattern = r"\((\d+)\)"
-        path = f"output/{file_name}.xlsx"
+        stream_stats = []
         message = [None] * len(self.prompts)
 
+        journal = Journal(
+            f"output/{file_name}.journal.jsonl",
+            {"system_prompt": system_prompt, "size": len(self.prompts)},
+        )
+        done = journal.open(resume)
+        for idx, value in done.items():
+            message[idx] = value
+
         async def execute_request(idx: int, prompt: str):
             request_data = {
                 "messages": [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": prompt},
                 ],
-                "maxTokens": self.h_params["max_tokens"],
+                "maxTokens": self.max_tokens,
                 "topP": self.h_params["top_p"],
                 "temperature": self.h_params["temperature"],
                 "repeatPenalty": self.h_params["repeat_penalty"],
             }
-            response_text = await self.hcx.execute_async(request_data)
+            response_text = await self._execute(idx, request_data, stream, stream_stats)
             if "content" in response_text:
                 message[idx] = response_text["content"]
+                journal.append(idx, message[idx])
 
         tasks = [
-            execute_request(idx, prompt) for idx, prompt in enumerate(self.prompts)
+            execute_request(idx, prompt)
+            for idx, prompt in enumerate(self.prompts)
+            if idx not in done
         ]
 
-        for i in range(0, len(tasks), 5):
-            print(f"Started generating #{i}.")
-            await asyncio.gather(*tasks[i : i + 5])
-            await asyncio.sleep(1)
+        with self.tracer.run(f"output/{file_name}.trace.jsonl") as trace:
+            try:
+                await gather_tasks(tasks)
+            finally:
+                await journal.close()
+        if stream:
+            StreamStats.report(stream_stats)
+
+        df = await self.post.run(_score_results, self.kmle, message)
+        print(f"점수: {df['correct'].sum()}")
+        print(accuracy_by(df, "category").to_string())
+        self.cache.report()
+        if isinstance(self.hcx, DedupExecutor):
+            self.hcx.report()
+        trace.report()
+
+        await self.post.write(df, file_name)
+
+        return df
 
-        df = pd.DataFrame(
+    @staticmethod
+    def _result_frame(kmle: list, message: list):
+        return pd.DataFrame(
             {
-                "question": [data["question"] for data in self.kmle],
-                "options": [data["options"] for data in self.kmle],
-                "answer": [data["answer_idx"][0] for data in self.kmle],
+                "category": [data["problem_category"] for data in kmle],
+                "question": [data["question"] for data in kmle],
+                "options": [data["options"] for data in kmle],
+                "answer": [int(data["answer_idx"][0]) for data in kmle],
+                "answers": [",".join(data["answer_idx"]) for data in kmle],
                 "pred_ori": message,
             }
         )
 
-        df["pred"] = df["pred_ori"].apply(
-            lambda answer: (
-                re.search(ans_pattern, answer).group(1)
-                if re.search(ans_pattern, answer)
-                else 0
-            )
+    async def _execute(
+        self, idx: int, request_data: dict, stream: bool, stream_stats: list
+    ):
+        if not stream:
+            return await self.hcx.execute_async(request_data)
+        # a question with several answers needs every index, not just the first
+        multi = len(self.kmle[idx]["answer_idx"]) > 1
+        response_text, stats = await self.hcx.execute_stream(
+            request_data, stop_pattern=None if multi else ANSWER_PATTERN
         )
+        if stats is not None:
+            stream_stats.append(stats)
+        return response_text
 
-        score = (df["pred"] == df["answer"]).sum()
-        print(f"점수: {score}")
-
-        df.to_excel(path, index=False)
-
-        return df
-    
     async def fill_nan(self, system_prompt: str, file_name: str):
-        ans_pattern = r"\((\d+)\)"
-        df = pd.read_excel(f"output/{file_name}.xlsx")
+        df, path = await self.post.read(file_name)
         idx = list(df[df["pred_ori"].isna()].index)
         if not idx:
             return
-        message = []
 
         nan_prompt = [self.prompts[i] for i in idx]
 
@@ -186,7 +298,7 @@ class KMLE:
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt},
                 ],
-                "maxTokens": self.h_params["max_tokens"],
+                "maxTokens": self.max_tokens,
                 "topP": self.h_params["top_p"],
                 "temperature": self.h_params["temperature"],
                 "repeatPenalty": self.h_params["repeat_penalty"],
@@ -197,51 +309,35 @@ class KMLE:
 
         tasks = [execute_request(prompt) for _, prompt in enumerate(nan_prompt)]
 
-        for i in range(0, len(tasks), 5):
-            print(f"Started generating #{i}.")
-            result = await asyncio.gather(*tasks[i : i + 5])
-            message.extend(result)
-            await asyncio.sleep(1)
+        message = await gather_tasks(tasks)
 
         for i, x in zip(idx, message):
             df.loc[i, "pred_ori"] = x
 
-        df["pred"] = df["pred_ori"].apply(
-            lambda answer: (
-                int(re.search(ans_pattern, answer).group(1))
-                if re.search(ans_pattern, answer)
-                else 0
-            )
-        )
-
-        score = (df["pred"] == df["answer"]).sum()
-        print(f"점수: {score}")
+        df = await self.post.run(score_predictions, df)
+        print(f"점수: {df['correct'].sum()}")
+        self.cache.report()
 
-        path = f"output/{file_name}.xlsx"
-        df.to_excel(path, index=False)
+        await self.post.run(write_frame, df, path)
 
         return df
 
     def _set_prompt(self, kmle=None):
         if not kmle:
             kmle = self.kmle
-        prompt_template = load_yaml("prompt/kmle.yaml")
-
-        prompt = prompt_template["user_prompt"]
-        prompts = [
-            prompt.format(
-                **{
-                    "CONTEXT": data["context"],
-                    "QUESTION": data["question"],
-                    "OPTIONS": "\n".join(
-                        [f"{key}. {value}" for key, value in data["options"].items()]
-                    ),
-                }
-            )
-            for data in kmle
-        ]
+        template = compile_template(load_prompts("prompt/kmle.yaml")["user_prompt"])
+
+        def to_fields(data):
+            return {
+                "CONTEXT": data["context"],
+                "QUESTION": data["question"],
+                "OPTIONS": "\n".join(
+                    [f"{key}. {value}" for key, value in data["options"].items()]
+                ),
+            }
 
-        return prompts
+        key = tuple((data["year"], data["session"], data["no"]) for data in kmle)
+        return prompt_set(key, template, kmle, to_fields)
 
     def get_questions(self, idx: int):
         data = self.kmle[idx]
@@ -259,49 +355,165 @@ class KMLE:
     def get_user_prompt(self, idx: int):
         print(self.prompts[idx])
 
-    def generate_tuning_data(self, system_prompt: str, file_name: str):
-        os.makedirs("tuning_data", exist_ok=True)
+    def generate_tuning_data(
+        self,
+        system_prompt: str,
+        file_name: str,
+        compress: bool = False,
+        upload: bool = True,
+    ):
+        """
+        Exports the training questions as a tuning CSV.
 
-        kmle = load_kmle(train=True)
-        prompts = self._set_prompt(kmle)
+        Rows are rendered one by one and streamed through a buffered (or gzip) writer
+        to `tuning_data/`. With `upload`, the same stream also goes to Object Storage
+        as a multipart upload whose parts are sent in parallel while later rows are
+        still being written, so memory stays bounded; the local file is written
+        first and kept, so a failed upload loses nothing.
 
-        path = f"tuning_data/{file_name}.csv"
-        f = open(path, "w")
-        writer = csv.writer(f)
+        Args:
+            system_prompt (str): System prompt written in every row.
+            file_name (str): Object / file name without extension.
+            compress (bool): gzip the CSV (`.csv.gz`).
+            upload (bool): Also upload to the `storage` bucket.
 
-        writer.writerow(["System_Prompt", "C_ID", "T_ID", "Text", "Completion"])
-        for idx, prompt in enumerate(prompts):
-            label = f"[정답] ({', '.join(kmle[idx]['answer_idx'])}) {', '.join(kmle[idx]['answer'])}"
-            writer.writerow([system_prompt, idx, 0, prompt, label])
+        Returns:
+            str: The object key (the dataset to pass to `tuning.create_task`) or the
+                local path written.
+        """
+        kmle = load_kmle(train=True)
+        prompts = self._set_prompt(kmle)
+        name = file_name + (".csv.gz" if compress else ".csv")
+        path = f"tuning_data/{name}"
+        os.makedirs("tuning_data", exist_ok=True)
 
+        if upload:
+            storage = self.api_info.get("storage", {})
+            client = s3_client(
+                self.h_params["access_key"],
+                self.h_params["secret_key"],
+                endpoint=storage.get("endpoint", "https://kr.object.ncloudstorage.com"),
+                region=storage.get("region", "kr-standard"),
+                max_connections=storage.get("max_workers", 4),
+                max_retries=storage.get("max_retries", 3),
+            )
+            uploader = MultipartWriter(
+                client,
+                storage.get("bucket", "dhlab.workshop"),
+                name,
+                part_size=storage.get("part_size_mb", 8) * 1024 * 1024,
+                max_workers=storage.get("max_workers", 4),
+            )
+            try:
+                local = io.FileIO(path, "w")
+            except BaseException:
+                uploader.abort()
+                raise
+            raw = TeeWriter(uploader, local)
+            target = name
+        else:
+            raw = io.FileIO(path, "w")
+            target = path
+
+        f = open_text(raw, compress)
+        try:
+            writer = csv.writer(f)
+            writer.writerow(["System_Prompt", "C_ID", "T_ID", "Text", "Completion"])
+            for idx, prompt in enumerate(prompts):
+                label = f"[정답] ({', '.join(kmle[idx]['answer_idx'])}) {', '.join(kmle[idx]['answer'])}"
+                writer.writerow([system_prompt, idx, 0, prompt, label])
+        except BaseException:
+            if upload:
+                raw.abort()
+            else:
+                raw.close()
+            raise
         f.close()
 
-        s3 = boto3.client(
-            service_name="s3",
-            endpoint_url="https://kr.object.ncloudstorage.com",
-            region_name="kr-standard",
-            aws_access_key_id=self.h_params["access_key"],
-            aws_secret_access_key=self.h_params["secret_key"],
-        )
+        return target
 
-        s3.upload_file(path, "dhlab.workshop", file_name + ".csv")
+    async def close(self):
+        """
+        Closes the HCX connection pool, the post-processing workers and the cache.
+        """
+        await self.hcx.close()
+        self.post.close()
+        await asyncio.to_thread(self.cache.close)
 
 
 class BananaPunch:
-    def __init__(self, api_key: str, apigw_api_key: str, request_id: str, gpt_key: str):
-        self.prompts = load_yaml("prompt/banana.yaml")
+    def __init__(
+        self,
+        api_key: str = None,
+        apigw_api_key: str = None,
+        request_id: str = None,
+        gpt_key: str = None,
+        use_cache: bool = True,
+    ):
+        """
+        Args:
+            api_key, apigw_api_key, request_id: A single HCX credential triple. When
+                omitted, requests are spread across every credential listed in the
+                `colab` section of api_info.yaml.
+            gpt_key (str): OpenAI API key used by `evaluate` (defaults to the
+                OPENAI_API_KEY environment variable; only needed to evaluate).
+            use_cache (bool): Set to False to bypass the response cache.
+        """
+        self.prompts = load_prompts("prompt/banana.yaml")
         self.questions = load_questions()
         self.api_info = load_yaml("api_info.yaml")
         self.h_params = self.api_info["colab"]
         self.gpt_key = gpt_key
 
-        self.hcx = CompletionExecutor(
-            host=self.h_params["host"],
-            api_key=api_key,
-            api_key_primary_val=apigw_api_key,
-            request_id=request_id,
+        scheduler_config = self.api_info.get("scheduler")
+        self.cache = ResponseCache.from_config(
+            self.api_info.get("cache"), enabled=use_cache
+        )
+        self.tracer = Tracer.from_config(self.api_info.get("trace"))
+        self.post = PostProcessor.from_config(self.api_info.get("output"))
+        self.budget = TokenBudget.from_config(
+            self.api_info.get("budget"), self.h_params["max_tokens"]
         )
-        self.gpt = AsyncClient(api_key=self.gpt_key)
+
+        if api_key is None:
+            self.hcx = CompletionExecutorPool.from_config(
+                self.h_params, scheduler_config, cache=self.cache, tracer=self.tracer
+            )
+        else:
+            self.hcx = CompletionExecutor(
+                host=self.h_params["host"],
+                api_key=api_key,
+                api_key_primary_val=apigw_api_key,
+                request_id=request_id,
+                scheduler=Scheduler.from_config(scheduler_config),
+                cache=self.cache,
+                tracer=self.tracer,
+            )
+        dedup_config = self.api_info.get("dedup") or {}
+        if dedup_config.get("enabled", False):
+            self.hcx = DedupExecutor.from_config(self.hcx, dedup_config)
+        # created on first use, so running without an OpenAI key works
+        self._gpt = None
+        self._judge = None
+
+    @property
+    def gpt(self):
+        if self._gpt is None:
+            # retries are handled by the judge
+            self._gpt = AsyncClient(api_key=self.gpt_key, max_retries=0)
+        return self._gpt
+
+    @gpt.setter
+    def gpt(self, client):
+        self._gpt = client
+
+    @property
+    def judge(self):
+        if self._judge is None:
+            self._judge = Judge.from_config(
+                self.gpt, self.api_info.get("judge"), cache=self.cache
+            )
+        return self._judge
 
     def test(self, prompt: str):
         """
@@ -324,7 +536,6 @@ class BananaPunch:
 
     async def run_test(self, system_prompt: str, section: str, start: int, end: int):
         user_prompt = self.prompt_preprocessing(section)[start : end + 1]
-        message = []
 
         async def execute_request(user_prompt: str):
             request_data = {
@@ -332,7 +543,7 @@ class BananaPunch:
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt},
                 ],
-                "maxTokens": self.h_params["max_tokens"],
+                "maxTokens": self.budget.max_tokens(section),
                 "topP": self.h_params["top_p"],
                 "temperature": self.h_params["temperature"],
                 "repeatPenalty": self.h_params["repeat_penalty"],
@@ -343,25 +554,33 @@ class BananaPunch:
 
         tasks = [execute_request(prompt) for _, prompt in enumerate(user_prompt)]
 
-        for i in range(0, len(tasks), 5):
-            print(f"Started generating #{i}.")
-            result = await asyncio.gather(*tasks[i : i + 5])
-            message.extend(result)
-            await asyncio.sleep(1)
+        message = await gather_tasks(tasks)
 
-        df = self.questions[section][start : end + 1]
-        df.loc[:, "pred"] = message
+        # a private copy: the question frames are shared by concurrent runs
+        df = self.questions[section][start : end + 1].copy()
+        df["pred"] = message
 
         if section == "intent_classifier":
             score = (df["pred"] == df["의도 분류"]).sum()
             print(f"점수: {score}")
+        self.cache.report()
 
         return df
 
-    async def run(self, system_prompt: str, section: str, file_name: str):
+    async def run(
+        self,
+        system_prompt: str,
+        section: str,
+        file_name: str,
+        resume: bool = False,
+        dry_run: bool = False,
+    ):
         """
         Generates results for a given set of questions using prompts, and outputs the results as an Excel file.
 
+        Each response is appended to `output/{file_name}.journal.jsonl` as soon as it arrives,
+        and per-request spans go to `output/{file_name}.trace.jsonl`.
+
         Args:
             system_prompt (str): A string containing the system prompt that needs to be processed.
             section (str): Specifies which section of the questions to run.
@@ -371,22 +590,46 @@ class BananaPunch:
                         - 'product_inquiry_handler': Manages questions about product inquiries.
                         - 'unwanted_topic_blocker': Blocks questions related to unwanted topics.
 
-            file_name (str): The name of the Excel file where the results will be saved.
+            file_name (str): The name of the result file: `output/{file_name}.xlsx`, or `.parquet`
+                / `.csv` as set in the `output` section of api_info.yaml.
+            resume (bool): Skip the questions already recorded in the journal of an interrupted run.
+            dry_run (bool): Only print the projected tokens, cost and time of the run.
 
         Returns:
-            DataFrame: The file to the generated Excel file containing the results.
+            DataFrame: The file to the generated Excel file containing the results (the
+                projection for a dry run).
         """
+        if dry_run:
+            return self.budget.dry_run(
+                system_prompt,
+                self.prompt_preprocessing(section),
+                self.budget.max_tokens(section),
+                self.api_info.get("scheduler"),
+                keys=len(getattr(self.hcx, "executors", [self.hcx])),
+            )
         os.makedirs("output", exist_ok=True)
         user_prompt = self.prompt_preprocessing(section)
         message = [None] * len(user_prompt)
 
+        journal = Journal(
+            f"output/{file_name}.journal.jsonl",
+            {
+                "system_prompt": system_prompt,
+                "section": section,
+                "size": len(user_prompt),
+            },
+        )
+        done = journal.open(resume)
+        for idx, value in done.items():
+            message[idx] = value
+
         async def execute_request(idx: int, user_prompt: str):
             request_data = {
                 "messages": [
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt},
                 ],
-                "maxTokens": self.h_params["max_tokens"],
+                "maxTokens": self.budget.max_tokens(section),
                 "topP": self.h_params["top_p"],
                 "temperature": self.h_params["temperature"],
                 "repeatPenalty": self.h_params["repeat_penalty"],
@@ -394,72 +637,119 @@ class BananaPunch:
             response_text = await self.hcx.execute_async(request_data)
             if "content" in response_text:
                 message[idx] = response_text["content"]
+                journal.append(idx, message[idx])
 
-        tasks = [execute_request(idx, prompt) for idx, prompt in enumerate(user_prompt)]
+        tasks = [
+            execute_request(idx, prompt)
+            for idx, prompt in enumerate(user_prompt)
+            if idx not in done
+        ]
 
-        for i in range(0, len(tasks), 5):
-            print(f"Started generating #{i}.")
-            await asyncio.gather(*tasks[i : i + 5])
-            await asyncio.sleep(1)
+        with self.tracer.run(f"output/{file_name}.trace.jsonl") as trace:
+            try:
+                await gather_tasks(tasks)
+            finally:
+                await journal.close()
 
-        df = self.questions[section]
+        # a private copy: concurrent runs of the section would overwrite `pred`
+        # before the file is written in the pool
+        df = self.questions[section].copy()
         df["pred"] = message
 
         if section == "intent_classifier":
             score = (df["pred"] == df["의도 분류"]).sum()
             print(f"점수: {score}")
+        self.cache.report()
+        if isinstance(self.hcx, DedupExecutor):
+            self.hcx.report()
+        trace.report()
 
-        path = f"output/{file_name}.xlsx"
-        df.to_excel(path, index=False)
+        await self.post.write(df, file_name)
 
         return df
 
-    async def evaluate(self, file_name: str):
+    async def evaluate(self, file_name: str, resume: bool = False, batch: bool = False):
         """
         Evaluates the results in an Excel file generated by the `run` function and updates the file with scores.
 
+        Rows that could not be scored keep an empty `score` and the reason in `judge_error`.
+        Scores are appended to `output/{file_name}.judge.jsonl` as they arrive.
+
         Args:
-            file_name (str): The name of the Excel file to be evaluated and updated.
+            file_name (str): The name of the result file to be evaluated and updated.
+            resume (bool): Skip the rows already scored by an interrupted evaluation.
+            batch (bool): Score through the OpenAI Batch API (cheaper, but may take minutes
+                to hours). The batch input is written to `output/{file_name}.batch.jsonl`.
 
         Returns:
-            str: The path to the updated Excel file containing the scores.
+            str: The path to the updated result file containing the scores.
         """
-        path = f"output/{file_name}.xlsx"
-        df = pd.read_excel(path)
-        message = [None] * len(df)
+        df, path = await self.post.read(file_name)
+        results = [None] * len(df)
+        evaluate_prompt = compile_template(self.prompts["evaluate_prompt"])
         prompts = [
-            self.prompts["evaluate_prompt"].format(**{"data": f"질문: {q}\n답변: {p}"})
+            evaluate_prompt.render(data=f"질문: {q}\n답변: {p}")
             for q, p in zip(df["질문"], df["pred"])
         ]
-        print(f"Started evaluating #{len(message)}.")
-
-        async def execute_request(idx, prompt, model="gpt-4o-mini"):
-            completion = await self.gpt.chat.completions.create(
-                model=model,
-                messages=[
-                    {"role": "user", "content": prompt},
-                ],
-                temperature=0.1,
-                max_tokens=256,
-            )
-            message[idx] = completion.choices[0].message.content
 
-        tasks = [execute_request(idx, prompt) for idx, prompt in enumerate(prompts)]
-
-        await asyncio.gather(*tasks)
-        message = [int(meg.split("score:")[-1].strip()) for meg in message]
-        print(f"점수: {sum(message) / len(message):.2f}")
-        df["score"] = message
-        df.to_excel(path, index=False)
+        # an edited or regenerated result file must not resume from stale scores
+        rows = json.dumps(prompts, ensure_ascii=False).encode("utf-8")
+        journal = Journal(
+            f"output/{file_name}.judge.jsonl",
+            {
+                "evaluate_prompt": self.prompts["evaluate_prompt"],
+                "size": len(df),
+                "rows": hashlib.sha256(rows).hexdigest(),
+            },
+        )
+        done = journal.open(resume)
+        for idx, value in done.items():
+            results[idx] = value
+        print(f"Started evaluating #{len(results) - len(done)}.")
+
+        async def execute_request(idx, prompt):
+            results[idx] = await self.judge.score(prompt)
+            if results[idx]["error"] is None:
+                journal.append(idx, results[idx])
+
+        try:
+            if batch:
+                pending = [idx for idx in range(len(prompts)) if idx not in done]
+                scored = await self.judge.score_batch(
+                    [prompts[idx] for idx in pending], f"output/{file_name}.batch.jsonl"
+                )
+                for idx, result in zip(pending, scored):
+                    results[idx] = result
+                    if result["error"] is None:
+                        journal.append(idx, result)
+            else:
+                tasks = [
+                    execute_request(idx, prompt)
+                    for idx, prompt in enumerate(prompts)
+                    if idx not in done
+                ]
+                await gather_tasks(tasks)
+        finally:
+            await journal.close()
+
+        df["score"] = [result["score"] for result in results]
+        df["judge_error"] = [result["error"] for result in results]
+        scores = df["score"].dropna()
+        if len(scores):
+            print(f"점수: {scores.mean():.2f}")
+        failed = df["judge_error"].notna().sum()
+        if failed:
+            print(f"Failed to score #{failed}. See the judge_error column.")
+        self.cache.report()
+        await self.post.run(write_frame, df, path)
 
         return path
 
     async def fill_nan(self, system_prompt: str, section: str, file_name: str):
-        df = pd.read_excel(f"output/{file_name}.xlsx")
+        df, path = await self.post.read(file_name)
         idx = list(df[df["pred"].isna()].index)
         if not idx:
             return
-        message = []
 
         user_prompt = self.prompt_preprocessing(section)
         nan_prompt = [user_prompt[i] for i in idx]
@@ -470,7 +760,7 @@ class BananaPunch:
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt},
                 ],
-                "maxTokens": self.h_params["max_tokens"],
+                "maxTokens": self.budget.max_tokens(section),
                 "topP": self.h_params["top_p"],
                 "temperature": self.h_params["temperature"],
                 "repeatPenalty": self.h_params["repeat_penalty"],
@@ -481,11 +771,7 @@ class BananaPunch:
 
         tasks = [execute_request(prompt) for _, prompt in enumerate(nan_prompt)]
 
-        for i in range(0, len(tasks), 5):
-            print(f"Started generating #{i}.")
-            result = await asyncio.gather(*tasks[i : i + 5])
-            message.extend(result)
-            await asyncio.sleep(1)
+        message = await gather_tasks(tasks)
 
         for i, x in zip(idx, message):
             df.loc[i, "pred"] = x
@@ -493,17 +779,17 @@ class BananaPunch:
         if section == "intent_classifier":
             score = (df["pred"] == df["의도 분류"]).sum()
             print(f"점수: {score}")
+        self.cache.report()
 
-        path = f"output/{file_name}.xlsx"
-        df.to_excel(path, index=False)
+        await self.post.run(write_frame, df, path)
 
         return df
 
     def prompt_preprocessing(self, section: str):
-        questions = self.questions[section]["질문"]
-        return [
-            self.prompts["user_prompt"].format(**{"question": q}) for q in questions
-        ]
+        template = compile_template(self.prompts["user_prompt"])
+        questions = self.questions[section]["질문"].tolist()
+        key = (getattr(self.questions, "cache_dir", None), section, len(questions))
+        return prompt_set(key, template, questions, lambda q: {"question": q})
 
     def get_questions(self, section: str, idx: int):
         data = self.questions[section]
@@ -517,76 +803,503 @@ class BananaPunch:
         user_prompt = self.prompt_preprocessing(section)
         print(user_prompt[idx])
 
+    async def close(self):
+        """
+        Closes the HCX connection pool, the OpenAI client, the post-processing workers
+        and the cache.
+        """
+        await self.hcx.close()
+        if self._gpt is not None:
+            await self._gpt.close()
+        self.post.close()
+        await asyncio.to_thread(self.cache.close)
+
     def __repr__(self):
         return "바나나펀치에 오신 여러분 환영합니다!"
 
 
+class StreamStats:
+    """
+    Timing of one streamed completion.
+    """
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.first_token = None
+        self.end = None
+        self.tokens = 0
+        self.stopped_early = False
+
+    @property
+    def ttft(self):
+        """Time to first token in seconds."""
+        if self.first_token is None:
+            return None
+        return self.first_token - self.start
+
+    @property
+    def tokens_per_sec(self):
+        if self.first_token is None or self.end is None or self.end <= self.first_token:
+            return None
+        return self.tokens / (self.end - self.first_token)
+
+    @staticmethod
+    def report(stats: list):
+        ttft = [x.ttft for x in stats if x.ttft is not None]
+        tps = [x.tokens_per_sec for x in stats if x.tokens_per_sec is not None]
+        if not ttft:
+            return
+        print(
+            f"TTFT: {sum(ttft) / len(ttft):.2f}s (max {max(ttft):.2f}s), "
+            f"{sum(tps) / len(tps) if tps else 0:.1f} tokens/s, "
+            f"stopped early: {sum(x.stopped_early for x in stats)}/{len(stats)}"
+        )
+
+
 class CompletionExecutor:
-    def __init__(self, host, api_key, api_key_primary_val, request_id):
+    MODEL = "HCX-003"
+
+    def __init__(
+        self,
+        host,
+        api_key,
+        api_key_primary_val,
+        request_id,
+        pool_size: int = 100,
+        timeout: float = 120,
+        scheduler: Scheduler = None,
+        cache: ResponseCache = None,
+        tracer: Tracer = None,
+    ):
         self._host = host
         self._api_key = api_key
         self._api_key_primary_val = api_key_primary_val
         self._request_id = request_id
-
-    def execute(self, completion_request):
-        headers = {
+        self._pool_size = pool_size
+        self._timeout = timeout
+        self._scheduler = scheduler
+        self._cache = cache
+        self._tracer = tracer or Tracer(enabled=False)
+
+        self._sync_session = requests.Session()
+        self._session = None
+        self._session_loop = None
+
+    def _headers(self):
+        return {
             "X-NCP-CLOVASTUDIO-API-KEY": self._api_key,
             "X-NCP-APIGW-API-KEY": self._api_key_primary_val,
             "X-NCP-CLOVASTUDIO-REQUEST-ID": self._request_id,
             "Content-Type": "application/json; charset=utf-8",
         }
 
-        with requests.post(
-            self._host + "/testapp/v1/chat-completions/HCX-003",
-            headers=headers,
-            json=completion_request,
-        ) as r:
-            response = r.content.decode("utf-8")
-            try:
-                result = eval(response)["result"]["message"]
-            except:
-                result = {"error": response}
-            return result
+    def _get_session(self):
+        """
+        Returns the keep-alive aiohttp session, creating it on first use.
 
-    async def execute_async(self, completion_request):
-        max_tries = 5
-        try_cnt = 0
+        The session is bound to the event loop it was created in, so a new one is
+        opened when called from a different loop (e.g. a second `asyncio.run`).
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            self._session is None
+            or self._session.closed
+            or self._session_loop is not loop
+        ):
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_size, keepalive_timeout=60, ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+            self._session_loop = loop
+        return self._session
 
-        while try_cnt < max_tries:
-            headers = {
-                "X-NCP-CLOVASTUDIO-API-KEY": self._api_key,
-                "X-NCP-APIGW-API-KEY": self._api_key_primary_val,
-                "X-NCP-CLOVASTUDIO-REQUEST-ID": self._request_id,
-                "Content-Type": "application/json; charset=utf-8",
-            }
-            with requests.post(
+    def _slot(self, completion_request: dict = None):
+        if self._scheduler is None:
+            return nullcontext()
+        if self._scheduler.token_bucket is None or completion_request is None:
+            return self._scheduler.slot()
+        return self._scheduler.slot(request_tokens(completion_request))
+
+    async def warmup(self):
+        """
+        Opens the keep-alive session and one connection to the host, so the first
+        request does not pay for the TCP/TLS handshake. Errors are ignored.
+        """
+        try:
+            async with self._get_session().head(self._host):
+                pass
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            pass
+
+    async def close(self):
+        """
+        Closes the pooled connections. The executor can still be used afterwards;
+        a new pool is opened on the next request.
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+        self._sync_session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def execute(self, completion_request):
+        if self._cache is not None:
+            cached = self._cache.get(self.MODEL, completion_request)
+            if cached is not None:
+                return cached
+        with self._tracer.span("request", sync=True) as span:
+            with self._sync_session.post(
+                self._host + "/testapp/v1/chat-completions/HCX-003",
+                headers=self._headers(),
+                json=completion_request,
+            ) as r:
+                result = decode_completion(r.content)
+            self._tracer.attempt(result.code, retried=False)
+            span.set(code=result.code, attempts=1)
+        if result.auth_error:
+            raise ValueError("Authorization Error. Please check API Key")
+        if not result.ok:
+            return {"error": result.raw}
+        if self._cache is not None:
+            self._cache.set(self.MODEL, completion_request, result.message)
+        return result.message
+
+    async def _attempt(self, completion_request):
+        """
+        Sends a single request without retrying.
+
+        Returns:
+            CompletionResult: `code` is None when no HCX status was received.
+        """
+        queued = time.perf_counter()
+        try:
+            async with self._slot(completion_request):
+                self._tracer.record("queue", time.perf_counter() - queued)
+                with self._tracer.span("network") as span:
+                    session = self._get_session()
+                    async with session.post(
+                        self._host + "/testapp/v1/chat-completions/HCX-003",
+                        headers=self._headers(),
+                        json=completion_request,
+                    ) as r:
+                        span.set(status=r.status)
+                        body = await r.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return CompletionResult(raw=str(e))
+
+        with self._tracer.span("parse"):
+            result = decode_completion(body)
+        if self._scheduler is not None and result.code is not None:
+            self._scheduler.report(result.code)
+        return result
+
+    async def stream_async(self, completion_request, stats: StreamStats = None):
+        """
+        Streams the completion through the server-sent-event variant of the endpoint.
+
+        Args:
+            completion_request (dict): Same request body as `execute_async`.
+            stats (StreamStats): Optional; filled with time-to-first-token and token counts.
+
+        Yields:
+            str: Content tokens as they arrive.
+
+        Raises:
+            CompletionError: If the API answers with an error instead of a stream, or
+                the stream reports an error or cannot be decoded.
+        """
+        headers = self._headers()
+        headers["Accept"] = "text/event-stream"
+
+        queued = time.perf_counter()
+        async with self._slot(completion_request):
+            self._tracer.record("queue", time.perf_counter() - queued)
+            if stats is not None:
+                # measure from the moment the request is sent, not from queueing
+                stats.start = time.monotonic()
+            session = self._get_session()
+            async with session.post(
                 self._host + "/testapp/v1/chat-completions/HCX-003",
                 headers=headers,
                 json=completion_request,
             ) as r:
-                response = r.content.decode("utf-8")
+                if r.content_type != "text/event-stream":
+                    result = decode_completion(await r.read())
+                    if result.code is not None and self._scheduler is not None:
+                        self._scheduler.report(result.code)
+                    raise CompletionError(result)
+
+                if self._scheduler is not None:
+                    self._scheduler.report("20000")
+                event = None
                 try:
-                    # result = eval(response)["result"]["message"]
-                    result = eval(response)
-                    if result["status"]["code"] in [40100, 40101, 40102, 40103, 40104]:
+                    async for line in r.content:
+                        line = line.decode("utf-8").strip()
+                        if line.startswith("event:"):
+                            event = line[len("event:") :].strip()
+                        elif line.startswith("data:") and event == "token":
+                            payload = line[len("data:") :]
+                            try:
+                                content = decode_json(payload)["message"]["content"]
+                            except (ValueError, KeyError, TypeError):
+                                # undecodable event: code None, so retryable
+                                raise CompletionError(CompletionResult(raw=payload))
+                            if stats is not None:
+                                if stats.first_token is None:
+                                    stats.first_token = time.monotonic()
+                                stats.tokens += 1
+                            yield content
+                        elif line.startswith("data:") and event == "error":
+                            raise CompletionError(
+                                decode_completion(line[len("data:") :].strip())
+                            )
+                        elif line.startswith("data:") and event == "result":
+                            break
+                finally:
+                    if stats is not None:
+                        stats.end = time.monotonic()
+
+    async def execute_stream(self, completion_request, stop_pattern: str = None):
+        """
+        Streams a completion and collects it into a message.
+
+        Args:
+            completion_request (dict): Same request body as `execute_async`.
+            stop_pattern (str): Regex; generation is cut off as soon as the text so far matches it.
+
+        Returns:
+            tuple: (message dict like `execute_async` returns, StreamStats or None on failure).
+        """
+        max_tries = 5
+        try_cnt = 0
+        error = None
+
+        with self._tracer.span("request", stream=True) as span:
+            while try_cnt < max_tries:
+                stats = StreamStats()
+                content = ""
+                try:
+                    with self._tracer.span("network", stream=True):
+                        async with aclosing(
+                            self.stream_async(completion_request, stats)
+                        ) as tokens:
+                            async for token in tokens:
+                                content += token
+                                if stop_pattern and re.search(stop_pattern, content):
+                                    stats.stopped_early = True
+                                    break
+                    self._tracer.attempt("20000", retried=False)
+                    span.set(attempts=try_cnt + 1, ttft=stats.ttft, tokens=stats.tokens)
+                    return {"role": "assistant", "content": content}, stats
+                except CompletionError as e:
+                    if e.result.auth_error:
                         raise ValueError("Authorization Error. Please check API Key")
-                    elif result["status"]["code"] in [
-                        "40400",
-                        "42900",
-                        "42901",
-                        "50000",
-                    ]:
-                        try_cnt += 1
-                    elif result["status"]["message"] != "OK":
-                        raise ValueError(
-                            f"Error: {result['status']['message']}({result['status']['code']})"
-                        )
-                    elif "content" not in result["result"]["message"]:
-                        try_cnt += 1
-                    else:
-                        return result["result"]["message"]
-                except:
+                    error = e.result.raw
+                    try_cnt += 1
+                    retry = e.result.retryable and try_cnt < max_tries
+                    self._tracer.attempt(e.result.code or "stream_error", retried=retry)
+                    if not retry:
+                        break
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = str(e)
                     try_cnt += 1
-                await asyncio.sleep(2)
+                    self._tracer.attempt("stream_error", retried=try_cnt < max_tries)
+                    if try_cnt >= max_tries:
+                        break
+                with self._tracer.span("backoff"):
+                    await asyncio.sleep(2)
+
+            span.set(attempts=try_cnt, error=error)
+        return {"error": error}, None
+
+    async def execute_async(self, completion_request):
+        if self._cache is not None:
+            cached = self._cache.get(self.MODEL, completion_request)
+            if cached is not None:
+                return cached
+
+        max_tries = 5
+        try_cnt = 0
+
+        with self._tracer.span("request") as span:
+            while True:
+                result = await self._attempt(completion_request)
+                try_cnt += 1
+                retry = result.retryable and not result.ok and try_cnt < max_tries
+                self._tracer.attempt(result.code, retried=retry)
+                span.set(attempts=try_cnt, code=result.code)
+                if result.ok:
+                    if self._cache is not None:
+                        self._cache.set(self.MODEL, completion_request, result.message)
+                    return result.message
+                if result.auth_error:
+                    raise ValueError("Authorization Error. Please check API Key")
+                if not retry:
+                    return {"error": result.raw}
+                with self._tracer.span("backoff"):
+                    await asyncio.sleep(2)
+
+
+class CompletionExecutorPool:
+    """
+    Spreads HCX requests across several credential triples.
+
+    Every credential is a `CompletionExecutor` with its own scheduler, so each key
+    keeps its own concurrency window and rate budget. A key that answers with
+    429/5xx (or fails at the transport level) `eject_after` times in a row is taken
+    out of rotation for `eject_seconds`; retries go to the remaining keys.
+    """
+
+    def __init__(
+        self,
+        executors: list,
+        eject_after: int = 3,
+        eject_seconds: float = 30,
+        cache: ResponseCache = None,
+        tracer: Tracer = None,
+    ):
+        self.executors = executors
+        self._cache = cache
+        self._tracer = tracer or Tracer(enabled=False)
+        self.eject_after = eject_after
+        self.eject_seconds = eject_seconds
+
+        self._failures = [0] * len(executors)
+        self._ejected_until = [0.0] * len(executors)
+        self._next = 0
+
+    @classmethod
+    def from_config(
+        cls,
+        h_params: dict,
+        scheduler_config: dict = None,
+        cache: ResponseCache = None,
+        tracer: Tracer = None,
+    ):
+        """
+        Builds one executor per (api_key, api_key_apigw_api_key, request_id) entry of
+        the `colab` section of api_info.yaml.
+        """
+        scheduler_config = scheduler_config or {}
+        executors = [
+            CompletionExecutor(
+                host=h_params["host"],
+                api_key=api_key,
+                api_key_primary_val=primary_val,
+                request_id=request_id,
+                scheduler=Scheduler.from_config(scheduler_config),
+                tracer=tracer,
+            )
+            for api_key, primary_val, request_id in zip(
+                h_params["api_key"],
+                h_params["api_key_apigw_api_key"],
+                h_params["request_id"],
+            )
+        ]
+        return cls(
+            executors,
+            eject_after=scheduler_config.get("eject_after", 3),
+            eject_seconds=scheduler_config.get("eject_seconds", 30),
+            cache=cache,
+            tracer=tracer,
+        )
+
+    def _pick(self):
+        now = time.monotonic()
+        healthy = [i for i, t in enumerate(self._ejected_until) if t <= now]
+        if not healthy:
+            # every key is ejected: use the one that comes back first
+            return min(range(len(self.executors)), key=lambda i: self._ejected_until[i])
+
+        def load(i):
+            scheduler = self.executors[i]._scheduler
+            if scheduler is None:
+                return 0
+            return scheduler.in_flight / scheduler.limit
+
+        # round-robin among the least loaded keys
+        order = healthy[self._next % len(healthy) :] + healthy[: self._next % len(healthy)]
+        self._next += 1
+        return min(order, key=load)
+
+    def _record(self, i: int, code):
+        if code is None or str(code) in ["42900", "42901"] or str(code).startswith("5"):
+            self._failures[i] += 1
+            if self._failures[i] >= self.eject_after:
+                self._failures[i] = 0
+                self._ejected_until[i] = time.monotonic() + self.eject_seconds
+                print(f"Ejected key #{i} for {self.eject_seconds}s.")
+        else:
+            self._failures[i] = 0
+
+    def execute(self, completion_request):
+        if self._cache is not None:
+            cached = self._cache.get(CompletionExecutor.MODEL, completion_request)
+            if cached is not None:
+                return cached
+        message = self.executors[self._pick()].execute(completion_request)
+        if self._cache is not None and "content" in message:
+            self._cache.set(CompletionExecutor.MODEL, completion_request, message)
+        return message
+
+    async def execute_async(self, completion_request):
+        if self._cache is not None:
+            cached = self._cache.get(CompletionExecutor.MODEL, completion_request)
+            if cached is not None:
+                return cached
+
+        max_tries = 5
+        try_cnt = 0
+
+        with self._tracer.span("request") as span:
+            while True:
+                i = self._pick()
+                result = await self.executors[i]._attempt(completion_request)
+                self._record(i, result.code)
+                try_cnt += 1
+                retry = result.retryable and not result.ok and try_cnt < max_tries
+                self._tracer.attempt(result.code, retried=retry)
+                span.set(attempts=try_cnt, code=result.code, key=i)
+                if result.ok:
+                    if self._cache is not None:
+                        self._cache.set(
+                            CompletionExecutor.MODEL, completion_request, result.message
+                        )
+                    return result.message
+                if result.auth_error:
+                    raise ValueError("Authorization Error. Please check API Key")
+                if not retry:
+                    return {"error": result.raw}
+                with self._tracer.span("backoff"):
+                    await asyncio.sleep(2)
+
+    async def execute_stream(self, completion_request, stop_pattern: str = None):
+        i = self._pick()
+        message, stats = await self.executors[i].execute_stream(
+            completion_request, stop_pattern=stop_pattern
+        )
+        self._record(i, None if stats is None else "20000")
+        return message, stats
+
+    def healthy(self):
+        """
+        Number of keys currently in rotation.
+        """
+        now = time.monotonic()
+        return sum(t <= now for t in self._ejected_until)
+
+    async def warmup(self):
+        await asyncio.gather(*[executor.warmup() for executor in self.executors])
 
-        return {"error": response}
+    async def close(self):
+        for executor in self.executors:
+            await executor.close()
@@ -0,0 +1,117 @@
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+
+FORMATS = ["xlsx", "parquet", "csv"]
+
+
+def write_frame(df: pd.DataFrame, path: str):
+    """
+    Writes a result frame in the format given by the file extension.
+
+    `.parquet` needs pyarrow (or fastparquet); `.csv` is written with a BOM so Excel
+    opens the Korean text correctly.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    elif path.endswith(".csv"):
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    else:
+        df.to_excel(path, index=False)
+    return path
+
+
+def read_frame(path: str):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    if path.endswith(".csv"):
+        return pd.read_csv(path, encoding="utf-8-sig")
+    return pd.read_excel(path)
+
+
+class PostProcessor:
+    """
+    Runs result post-processing (scoring, frame building, file I/O) off the event loop.
+
+    Work goes to a thread pool, or to a process pool with `processes=True` (the
+    functions and their arguments must then be picklable, i.e. module-level
+    functions and plain data). Result files are written as `format`: `xlsx`
+    (openpyxl, slowest), `parquet` or `csv`.
+    """
+
+    def __init__(self, format: str = "xlsx", max_workers: int = 2, processes: bool = False):
+        if format not in FORMATS:
+            raise ValueError(f"format must be one of {FORMATS}")
+        self.format = format
+        self.max_workers = max_workers
+        self.processes = processes
+        self._executor = None
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        Builds a post-processor from the `output` section of api_info.yaml.
+        """
+        config = config or {}
+        return cls(
+            format=config.get("format", "xlsx"),
+            max_workers=config.get("workers", 2),
+            processes=config.get("processes", False),
+        )
+
+    def _get_executor(self):
+        if self._executor is None:
+            pool = ProcessPoolExecutor if self.processes else ThreadPoolExecutor
+            self._executor = pool(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Awaits `fn(*args, **kwargs)` executed in the pool.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), partial(fn, *args, **kwargs)
+        )
+
+    def path(self, file_name: str):
+        return f"output/{file_name}.{self.format}"
+
+    async def write(self, df: pd.DataFrame, file_name: str):
+        """
+        Writes `output/{file_name}.{format}` in the pool.
+
+        Returns:
+            str: The path written.
+        """
+        return await self.run(write_frame, df, self.path(file_name))
+
+    def find(self, file_name: str):
+        """
+        Returns the existing result file of `file_name`, preferring the configured format.
+        """
+        for format in [self.format] + FORMATS:
+            path = f"output/{file_name}.{format}"
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f"No result file for {file_name} in output/")
+
+    async def read(self, file_name: str):
+        """
+        Reads the result file of `file_name` in the pool.
+
+        Returns:
+            tuple: (DataFrame, path)
+        """
+        path = self.find(file_name)
+        return await self.run(read_frame, path), path
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
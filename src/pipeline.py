@@ -0,0 +1,190 @@
+import asyncio
+import time
+
+import pandas as pd
+
+from src.prompt import compile_template
+from src.scheduler import gather_tasks
+
+
+# intent label -> handler section
+ROUTES = {
+    "가게관련": "store_inquiry_handler",
+    "상품관련": "product_inquiry_handler",
+    "기타": "unwanted_topic_blocker",
+}
+
+
+def default_prompts(prompts: dict):
+    """
+    System prompts of every stage from prompt/banana.yaml, with the store and
+    product information appended to their handlers.
+    """
+    return {
+        "intent_classifier": prompts["intent_classifier"],
+        "store_inquiry_handler": prompts["store_inquiry_handler"]
+        + "\n# 가게 정보\n"
+        + prompts["store_introduction"],
+        "product_inquiry_handler": prompts["product_inquiry_handler"]
+        + "\n# 상품 정보\n"
+        + prompts["product_list"],
+        "unwanted_topic_blocker": prompts["unwanted_topic_blocker"],
+    }
+
+
+class RoutingPipeline:
+    """
+    End-to-end banana chatbot: `intent_classifier` routes every question to the
+    handler of its intent.
+
+    Each question moves on to its handler as soon as its own classification
+    arrives, and both stages go through the same executor, so they share one
+    concurrency budget. `max_active` bounds the questions in flight (admission
+    control), which keeps end-to-end latency comparable to serving traffic instead
+    of measuring a queue of every question at once.
+    """
+
+    def __init__(
+        self,
+        punch,
+        system_prompts: dict = None,
+        fallback: str = "unwanted_topic_blocker",
+        max_active: int = None,
+    ):
+        """
+        Args:
+            punch (BananaPunch): Provides the prompts, executor and token budgets.
+            system_prompts (dict): Stage (section) -> system prompt; missing stages use
+                `default_prompts`.
+            fallback (str): Handler for classifications that match no intent.
+            max_active (int): Questions in the pipeline at once (None: all).
+        """
+        self.punch = punch
+        self.system_prompts = {
+            **default_prompts(punch.prompts),
+            **(system_prompts or {}),
+        }
+        self.fallback = fallback
+        self._user_prompt = compile_template(punch.prompts["user_prompt"])
+        self._active = asyncio.Semaphore(max_active) if max_active else None
+
+    def route(self, intent: str):
+        for label, section in ROUTES.items():
+            if intent and label in intent:
+                return label, section
+        return None, self.fallback
+
+    async def _stage(self, section: str, question: str):
+        request_data = {
+            "messages": [
+                {"role": "system", "content": self.system_prompts[section]},
+                {
+                    "role": "user",
+                    "content": self._user_prompt.render(question=question),
+                },
+            ],
+            "maxTokens": self.punch.budget.max_tokens(section),
+            "topP": self.punch.h_params["top_p"],
+            "temperature": self.punch.h_params["temperature"],
+            "repeatPenalty": self.punch.h_params["repeat_penalty"],
+        }
+        start = time.perf_counter()
+        with self.punch.tracer.span("stage", stage=section):
+            response_text = await self.punch.hcx.execute_async(request_data)
+        return response_text, time.perf_counter() - start
+
+    async def answer(self, question: str):
+        """
+        Classifies one question and answers it with the matching handler.
+
+        Returns:
+            dict: question, intent, route, answer, per-stage and total seconds and error.
+        """
+        if self._active is not None:
+            async with self._active:
+                return await self._answer(question)
+        return await self._answer(question)
+
+    async def _answer(self, question: str):
+        start = time.perf_counter()
+        row = {"question": question, "intent": None, "route": None, "answer": None}
+        with self.punch.tracer.span("pipeline"):
+            classified, row["classify_s"] = await self._stage(
+                "intent_classifier", question
+            )
+            if "content" not in classified:
+                row["error"] = f"intent_classifier: {classified.get('error')}"
+            else:
+                intent, row["route"] = self.route(classified["content"])
+                row["intent"] = intent or classified["content"].strip()
+                handled, row["handle_s"] = await self._stage(row["route"], question)
+                if "content" in handled:
+                    row["answer"] = handled["content"]
+                    row["error"] = None
+                else:
+                    row["error"] = f"{row['route']}: {handled.get('error')}"
+        row["total_s"] = time.perf_counter() - start
+        return row
+
+    @staticmethod
+    def summary(df: pd.DataFrame):
+        """
+        Latency percentiles of each stage and end to end.
+        """
+        stages = {"intent_classifier": df["classify_s"]}
+        for section in ROUTES.values():
+            stages[section] = df.loc[df["route"] == section, "handle_s"]
+        stages["end_to_end"] = df["total_s"]
+        return pd.DataFrame(
+            {
+                name: {
+                    "count": len(values.dropna()),
+                    "mean": values.mean(),
+                    "p50": values.quantile(0.5),
+                    "p95": values.quantile(0.95),
+                    "p99": values.quantile(0.99),
+                }
+                for name, values in stages.items()
+            }
+        ).T
+
+    async def run(
+        self, questions: list = None, labels: list = None, file_name: str = None
+    ):
+        """
+        Runs every question through the pipeline concurrently.
+
+        Args:
+            questions (list): Defaults to the `intent_classifier` questions, whose intent
+                labels are then used to report routing accuracy.
+            labels (list): Expected intents of `questions`, if known.
+            file_name (str): If given, rows are written to `output/{file_name}.{format}`.
+
+        Returns:
+            DataFrame: One row per question with route, answer and latencies.
+        """
+        if questions is None:
+            data = self.punch.questions["intent_classifier"]
+            questions = data["질문"].tolist()
+            labels = data["의도 분류"].tolist()
+
+        path = None if file_name is None else f"output/{file_name}.trace.jsonl"
+        start = time.perf_counter()
+        with self.punch.tracer.run(path):
+            rows = await gather_tasks([self.answer(q) for q in questions])
+        elapsed = time.perf_counter() - start
+
+        df = pd.DataFrame(rows)
+        if labels is not None:
+            df["label"] = labels
+            print(f"Routing accuracy: {(df['intent'] == df['label']).mean():.1%}")
+        print(self.summary(df).round(3).to_string())
+        self.punch.cache.report()
+        failed = df["error"].notna().sum()
+        print(
+            f"{len(df)} questions in {elapsed:.1f}s ({len(df) / elapsed:.1f}/s), "
+            f"failed: {failed}"
+        )
+        if file_name is not None:
+            await self.punch.post.write(df, file_name)
+        return df
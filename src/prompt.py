@@ -0,0 +1,100 @@
+import hashlib
+import os
+from collections.abc import Sequence
+from functools import lru_cache
+from string import Formatter
+
+from src.util import load_yaml
+
+
+_PROMPT_FILES = {}
+_PROMPT_SETS = {}
+
+
+def load_prompts(path: str):
+    """
+    Loads a prompt YAML file once; it is re-read only when the file changes.
+    """
+    mtime = os.stat(path).st_mtime_ns
+    cached = _PROMPT_FILES.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, load_yaml(path))
+        _PROMPT_FILES[path] = cached
+    return cached[1]
+
+
+class PromptTemplate:
+    """
+    `str.format` template compiled once into literal/field parts.
+
+    Rendering joins the parts directly instead of re-parsing the template. Templates
+    using format specs, conversions or attribute/index access fall back to
+    `str.format`.
+    """
+
+    def __init__(self, text: str):
+        self.text = text
+        self.hash = hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+        self._parts = []
+        self._simple = True
+        for literal, field, spec, conversion in Formatter().parse(text):
+            if field is not None and (
+                spec or conversion or not field.isidentifier()
+            ):
+                self._simple = False
+            self._parts.append((literal, field))
+
+    def render(self, **fields):
+        if not self._simple:
+            return self.text.format(**fields)
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field is not None:
+                out.append(str(fields[field]))
+        return "".join(out)
+
+
+@lru_cache(maxsize=None)
+def compile_template(text: str):
+    return PromptTemplate(text)
+
+
+class PromptSet(Sequence):
+    """
+    Lazily rendered prompts: `template` applied to `to_fields(item)` for each item.
+
+    Each prompt is rendered on first access and kept, so indexed lookups are O(1)
+    and a single lookup never renders the whole set.
+    """
+
+    def __init__(self, template: PromptTemplate, items: Sequence, to_fields):
+        self.template = template
+        self._items = items
+        self._to_fields = to_fields
+        self._rendered = [None] * len(items)
+
+    def __len__(self):
+        return len(self._rendered)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        if self._rendered[idx] is None:
+            self._rendered[idx] = self.template.render(
+                **self._to_fields(self._items[idx])
+            )
+        return self._rendered[idx]
+
+
+def prompt_set(key, template: PromptTemplate, items: Sequence, to_fields):
+    """
+    Returns the memoized `PromptSet` for (template, key), creating it on first use.
+
+    Args:
+        key: Hashable identity of `items` (e.g. section name or question ids).
+    """
+    memo_key = (template.hash, key)
+    if memo_key not in _PROMPT_SETS:
+        _PROMPT_SETS[memo_key] = PromptSet(template, items, to_fields)
+    return _PROMPT_SETS[memo_key]
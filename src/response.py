@@ -0,0 +1,108 @@
+import json
+from dataclasses import dataclass, field
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+
+AUTH_ERROR_CODES = ["40100", "40101", "40102", "40103", "40104"]
+RETRYABLE_CODES = ["40400", "42900", "42901", "50000"]
+
+
+@dataclass
+class Usage:
+    input_length: int = 0
+    output_length: int = 0
+
+
+@dataclass
+class CompletionResult:
+    """
+    Decoded HCX chat-completions response.
+
+    `code` is the HCX status code as a string, or None when the body could not be
+    decoded (transport error, HTML error page, truncated JSON, ...).
+    """
+
+    code: str = None
+    status_message: str = None
+    message: dict = None
+    usage: Usage = field(default_factory=Usage)
+    raw: str = ""
+
+    @property
+    def ok(self):
+        return (
+            self.status_message == "OK"
+            and self.message is not None
+            and "content" in self.message
+        )
+
+    @property
+    def auth_error(self):
+        return self.code in AUTH_ERROR_CODES
+
+    @property
+    def retryable(self):
+        if self.ok or self.auth_error:
+            return False
+        # undecodable bodies and OK responses without content are transient
+        return self.code is None or self.code in RETRYABLE_CODES or self.status_message == "OK"
+
+
+class CompletionError(ValueError):
+    """
+    The API answered a streamed request with an error; `result` holds the decoded
+    status, so callers can tell retryable from fatal errors.
+    """
+
+    def __init__(self, result: CompletionResult):
+        if result.code is None:
+            message = f"Error: {result.raw}"
+        else:
+            message = f"Error: {result.status_message}({result.code})"
+        super().__init__(message)
+        self.result = result
+
+
+def decode_completion(body):
+    """
+    Decodes a chat-completions response body.
+
+    Args:
+        body (bytes | str): Raw response body.
+
+    Returns:
+        CompletionResult: Never raises; undecodable bodies give a result with `code=None`.
+    """
+    raw = body.decode("utf-8", errors="replace") if isinstance(body, bytes) else body
+    try:
+        data = _loads(body)
+    except ValueError:
+        return CompletionResult(raw=raw)
+    if not isinstance(data, dict) or not isinstance(data.get("status"), dict):
+        return CompletionResult(raw=raw)
+
+    status = data["status"]
+    result = data.get("result") if isinstance(data.get("result"), dict) else {}
+    return CompletionResult(
+        code=str(status.get("code")),
+        status_message=status.get("message"),
+        message=result.get("message"),
+        usage=Usage(
+            input_length=result.get("inputLength") or 0,
+            output_length=result.get("outputLength") or 0,
+        ),
+        raw=raw,
+    )
+
+
+def decode_json(data):
+    """
+    Decodes a JSON document with the fastest available decoder.
+    """
+    return _loads(data)
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+
+RATE_LIMIT_CODES = ["42900", "42901"]
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1):
+        """
+        Waits until `amount` tokens are available and takes them.
+
+        Amounts above `burst` are capped at `burst`, so a large request waits for a
+        full bucket instead of forever.
+        """
+        amount = min(amount, self.burst)
+        while True:
+            self._refill()
+            if self._tokens >= amount:
+                self._tokens -= amount
+                return
+            await asyncio.sleep((amount - self._tokens) / self.rate)
+
+
+class Scheduler:
+    """
+    Sliding-window request scheduler with a token-bucket rate limit.
+
+    At most `limit` requests are in flight at once and requests start no faster
+    than `rate` per second. When the API answers with a rate-limit code both are
+    halved (down to `min_concurrency` / `min_rate`), and they grow back step by
+    step while responses keep succeeding.
+
+    With `tokens_per_minute` set, every request additionally takes its estimated
+    token cost (prompt + `maxTokens`) from a second bucket, so large requests are
+    spread over rate-limit windows by tokens rather than by request count.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 10,
+        min_concurrency: int = 1,
+        rate: float = 5.0,
+        burst: int = 5,
+        min_rate: float = 0.5,
+        tokens_per_minute: float = None,
+    ):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.rate = rate
+        self.min_rate = min_rate
+
+        self.limit = max_concurrency
+        self.bucket = TokenBucket(rate, burst)
+        self.token_bucket = (
+            TokenBucket(tokens_per_minute / 60, tokens_per_minute)
+            if tokens_per_minute
+            else None
+        )
+        self.in_flight = 0
+        self.throttled = 0
+
+        self._waiters = []
+        self._successes = 0
+        self._last_backoff = 0.0
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        Builds a scheduler from the `scheduler` section of api_info.yaml.
+        """
+        config = config or {}
+        return cls(
+            max_concurrency=config.get("max_concurrency", 10),
+            min_concurrency=config.get("min_concurrency", 1),
+            rate=config.get("rate", 5.0),
+            burst=config.get("burst", 5),
+            min_rate=config.get("min_rate", 0.5),
+            tokens_per_minute=config.get("tokens_per_minute"),
+        )
+
+    def _wake(self):
+        free = self.limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter = self._waiters.pop(0)
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def _enter(self):
+        while self.in_flight >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._wake()
+                raise
+        self.in_flight += 1
+
+    def _leave(self):
+        self.in_flight -= 1
+        self._wake()
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 0):
+        """
+        Holds one in-flight slot for the duration of a single HTTP attempt.
+
+        Args:
+            cost (float): Estimated tokens of the request, taken from the token budget
+                when `tokens_per_minute` is set.
+        """
+        await self._enter()
+        try:
+            await self.bucket.acquire()
+            if self.token_bucket is not None and cost:
+                await self.token_bucket.acquire(cost)
+            yield
+        finally:
+            self._leave()
+
+    def report(self, code):
+        """
+        Feeds back the status code of a finished attempt.
+
+        Rate-limit codes trigger a multiplicative back-off (at most once per
+        second, so one burst of 429s only halves the window once). Any other
+        code counts as a success; after `limit` successes in a row the window
+        grows by one and the rate recovers towards its configured value.
+        """
+        if str(code) in RATE_LIMIT_CODES:
+            self.throttled += 1
+            self._successes = 0
+            now = time.monotonic()
+            if now - self._last_backoff < 1:
+                return
+            self._last_backoff = now
+            self.limit = max(self.min_concurrency, self.limit // 2)
+            self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+            return
+
+        self._successes += 1
+        if self._successes >= self.limit:
+            self._successes = 0
+            self.limit = min(self.max_concurrency, self.limit + 1)
+            self.bucket.rate = min(self.rate, self.bucket.rate * 1.5)
+            self._wake()
+
+
+async def gather_tasks(tasks: list, log_every: int = 10):
+    """
+    Awaits all coroutines concurrently and returns their results in order.
+
+    Concurrency is bounded by the schedulers of the executors the tasks use, so
+    all tasks can be started at once: a slow response only holds its own slot
+    instead of a whole batch.
+    """
+    total = len(tasks)
+    done = 0
+
+    async def track(task):
+        nonlocal done
+        result = await task
+        done += 1
+        if done % log_every == 0 or done == total:
+            print(f"Finished generating #{done}/{total}.")
+        return result
+
+    return await asyncio.gather(*[track(task) for task in tasks])
@@ -0,0 +1,80 @@
+import re
+
+import pandas as pd
+
+
+ANSWER_PATTERN = r"\((\d+)\)"
+
+
+def extract_answer(pred: pd.Series, pattern: str = ANSWER_PATTERN):
+    """
+    Extracts the first answer index from every prediction in one vectorized pass.
+
+    Returns:
+        pd.Series: Int64 answer indices; 0 where the prediction is missing or has no match.
+    """
+    extracted = pred.astype("string").str.extract(pattern, expand=False)
+    return pd.to_numeric(extracted, errors="coerce").fillna(0).astype("Int64")
+
+
+def _answer_set(value):
+    # "1,3" -> {1, 3}
+    return frozenset(int(x) for x in str(value).split(",") if x.strip().isdigit())
+
+
+def score_predictions(
+    df: pd.DataFrame,
+    pred_col: str = "pred_ori",
+    answer_col: str = "answers",
+    pattern: str = ANSWER_PATTERN,
+):
+    """
+    Adds `pred` (first extracted answer index) and `correct` columns.
+
+    Single-answer questions are correct when `pred` equals the answer. Questions with
+    several answers (`answers` like "1,3") are correct when the set of every index in
+    the prediction equals the answer set.
+
+    Args:
+        df (DataFrame): Result frame with raw predictions and answers.
+        pred_col (str): Column with the raw model output.
+        answer_col (str): Column with the answer index, a comma-joined string of indices
+            or a list. Falls back to `answer` for frames written before `answers` existed.
+    """
+    if answer_col not in df.columns:
+        answer_col = "answer"
+
+    answers = df[answer_col]
+    if answers.map(lambda x: isinstance(x, (list, tuple))).any():
+        answers = answers.map(
+            lambda x: ",".join(map(str, x)) if isinstance(x, (list, tuple)) else x
+        )
+    answers = answers.astype("string").str.replace(" ", "", regex=False)
+    multi = answers.str.contains(",", regex=False).fillna(False).astype(bool)
+
+    df["pred"] = extract_answer(df[pred_col], pattern)
+    single_answer = pd.to_numeric(answers.where(~multi), errors="coerce").astype("Int64")
+    correct = (df["pred"] == single_answer).fillna(False).astype(bool)
+
+    if multi.any():
+        # few rows in practice; a compiled findall per row beats extractall + groupby
+        regex = re.compile(pattern)
+        found = df.loc[multi, pred_col].map(
+            lambda x: frozenset(map(int, regex.findall(x)))
+            if isinstance(x, str)
+            else frozenset()
+        )
+        expected = answers[multi].map(_answer_set)
+        correct[multi] = (found == expected).to_numpy()
+
+    df["correct"] = correct.astype(bool)
+    return df
+
+
+def accuracy_by(df: pd.DataFrame, by: str = "category"):
+    """
+    Per-group accuracy of a frame scored by `score_predictions`.
+    """
+    report = df.groupby(by, sort=False)["correct"].agg(["sum", "count", "mean"])
+    report.columns = ["correct", "total", "accuracy"]
+    return report
@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import math
+import time
+from collections import Counter, deque
+
+from aiohttp import web
+
+from src.dedup import normalize
+from src.model import BananaPunch
+from src.pipeline import RoutingPipeline
+from src.trace import LATENCY_BUCKETS
+
+
+STAGES = ["intent_classifier", "handler", "end_to_end"]
+
+
+class LatencyMetric:
+    """
+    Prometheus-style cumulative histogram plus the latest `samples` values for
+    quantiles.
+    """
+
+    def __init__(self, samples: int = 10000, buckets: tuple = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=samples)
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def quantile(self, q: float):
+        if not self.recent:
+            return math.nan
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class BananaService:
+    """
+    Long-lived HTTP service answering banana chatbot questions through
+    `RoutingPipeline`.
+
+    Prompts, questions and clients are loaded once by the given `BananaPunch`, and
+    the upstream keep-alive sessions are opened at startup. Questions arriving
+    within `batch_window` seconds (up to `max_batch`) are dispatched to the
+    scheduler together, and identical (normalized) questions of a batch share one
+    pipeline run.
+
+    Routes:
+        POST /chat     {"question": "..."} -> intent, route, answer and latencies
+        GET  /health   200 while the batcher runs and at least one key is in rotation
+        GET  /metrics  Prometheus text format
+    """
+
+    def __init__(
+        self,
+        punch,
+        system_prompts: dict = None,
+        batch_window: float = 0.005,
+        max_batch: int = 32,
+        max_active: int = 64,
+        latency_samples: int = 10000,
+    ):
+        self.punch = punch
+        self.pipeline = RoutingPipeline(punch, system_prompts, max_active=max_active)
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        if punch.tracer.max_samples is None:
+            # spans of a long-lived process would otherwise be kept forever
+            punch.tracer.max_samples = latency_samples
+            punch.tracer.reset()
+
+        self.latency = {stage: LatencyMetric(latency_samples) for stage in STAGES}
+        self.counters = Counter()
+        self.routes = Counter()
+        self.in_flight = 0
+        self._queue = None
+        self._batcher = None
+        self._tasks = set()
+        self._started = None
+
+    @classmethod
+    def from_config(cls, punch, system_prompts: dict = None):
+        """
+        Builds a service from the `server` section of api_info.yaml.
+        """
+        config = punch.api_info.get("server") or {}
+        return cls(
+            punch,
+            system_prompts,
+            batch_window=config.get("batch_window_ms", 5) / 1000,
+            max_batch=config.get("max_batch", 32),
+            max_active=config.get("max_active", 64),
+            latency_samples=config.get("latency_samples", 10000),
+        )
+
+    async def start(self, app: web.Application = None):
+        self._queue = asyncio.Queue()
+        await self.punch.hcx.warmup()
+        self._batcher = asyncio.create_task(self._batch_loop())
+        self._started = time.time()
+
+    async def stop(self, app: web.Application = None):
+        if self._batcher is not None:
+            self._batcher.cancel()
+            try:
+                await self._batcher
+            except asyncio.CancelledError:
+                pass
+            self._batcher = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await self.punch.close()
+
+    async def ask(self, question: str):
+        """
+        Queues one question for the next batch and waits for its pipeline row.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((question, future))
+        return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            groups = {}
+            for question, future in batch:
+                groups.setdefault(normalize(question), (question, []))[1].append(future)
+            self.counters["batches"] += 1
+            self.counters["batch_questions"] += len(batch)
+            self.counters["batch_coalesced"] += len(batch) - len(groups)
+            for question, futures in groups.values():
+                task = asyncio.create_task(self._dispatch(question, futures))
+                # the loop only keeps weak references to tasks
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, question: str, futures: list):
+        self.in_flight += 1
+        try:
+            row = await self.pipeline.answer(question)
+        except Exception as e:
+            row = {"question": question, "error": f"{type(e).__name__}: {e}"}
+        finally:
+            self.in_flight -= 1
+
+        if row.get("classify_s") is not None:
+            self.latency["intent_classifier"].observe(row["classify_s"])
+        if row.get("handle_s") is not None:
+            self.latency["handler"].observe(row["handle_s"])
+        if row.get("route") is not None:
+            self.routes[row["route"]] += 1
+        for future in futures:
+            if not future.done():
+                future.set_result(row)
+
+    async def chat(self, request: web.Request):
+        start = time.perf_counter()
+        try:
+            body = await request.json()
+        except ValueError:
+            body = None
+        question = body.get("question") if isinstance(body, dict) else None
+        if not isinstance(question, str) or not question.strip():
+            self.counters["bad_requests"] += 1
+            return web.json_response({"error": "'question' is required"}, status=400)
+
+        row = await self.ask(question)
+        latency = time.perf_counter() - start
+        self.latency["end_to_end"].observe(latency)
+        ok = row.get("error") is None
+        self.counters["ok" if ok else "error"] += 1
+        return web.json_response(
+            {**row, "latency_s": latency}, status=200 if ok else 502
+        )
+
+    def _healthy_keys(self):
+        healthy = getattr(self.punch.hcx, "healthy", None)
+        return healthy() if healthy is not None else 1
+
+    async def health(self, request: web.Request):
+        running = self._batcher is not None and not self._batcher.done()
+        keys = self._healthy_keys()
+        return web.json_response(
+            {
+                "status": "ok" if running and keys else "unavailable",
+                "uptime_s": time.time() - self._started if self._started else 0,
+                "healthy_keys": keys,
+                "queued": self._queue.qsize() if self._queue is not None else 0,
+                "in_flight": self.in_flight,
+            },
+            status=200 if running and keys else 503,
+        )
+
+    def render_metrics(self):
+        lines = [
+            "# TYPE banana_requests_total counter",
+            *[
+                f'banana_requests_total{{status="{status}"}} {self.counters[status]}'
+                for status in ["ok", "error", "bad_requests"]
+            ],
+            "# TYPE banana_routes_total counter",
+            *[
+                f'banana_routes_total{{route="{route}"}} {count}'
+                for route, count in self.routes.items()
+            ],
+            "# TYPE banana_batches_total counter",
+            f"banana_batches_total {self.counters['batches']}",
+            "# TYPE banana_batch_questions_total counter",
+            f"banana_batch_questions_total {self.counters['batch_questions']}",
+            "# TYPE banana_batch_coalesced_total counter",
+            f"banana_batch_coalesced_total {self.counters['batch_coalesced']}",
+            "# TYPE banana_queued gauge",
+            f"banana_queued {self._queue.qsize() if self._queue is not None else 0}",
+            "# TYPE banana_in_flight gauge",
+            f"banana_in_flight {self.in_flight}",
+            "# TYPE banana_healthy_keys gauge",
+            f"banana_healthy_keys {self._healthy_keys()}",
+            "# TYPE banana_upstream_attempts_total counter",
+            *[
+                f'banana_upstream_attempts_total{{code="{code}"}} {count}'
+                for code, count in self.punch.tracer.attempts.items()
+            ],
+            "# TYPE banana_upstream_retries_total counter",
+            *[
+                f'banana_upstream_retries_total{{code="{code}"}} {count}'
+                for code, count in self.punch.tracer.retries.items()
+            ],
+            "# TYPE banana_latency_seconds histogram",
+        ]
+        for stage, metric in self.latency.items():
+            for bound, count in zip(metric.buckets, metric.counts):
+                le = "+Inf" if math.isinf(bound) else bound
+                lines.append(
+                    f'banana_latency_seconds_bucket{{stage="{stage}",le="{le}"}} {count}'
+                )
+            lines.append(f'banana_latency_seconds_sum{{stage="{stage}"}} {metric.sum}')
+            lines.append(f'banana_latency_seconds_count{{stage="{stage}"}} {metric.count}')
+        lines.append("# TYPE banana_recent_latency_seconds gauge")
+        for stage, metric in self.latency.items():
+            for q in [0.5, 0.95, 0.99]:
+                lines.append(
+                    f'banana_recent_latency_seconds{{stage="{stage}",quantile="{q}"}} '
+                    f"{metric.quantile(q)}"
+                )
+        return "\n".join(lines) + "\n"
+
+    async def metrics(self, request: web.Request):
+        return web.Response(text=self.render_metrics(), content_type="text/plain")
+
+    def app(self):
+        app = web.Application()
+        app.router.add_post("/chat", self.chat)
+        app.router.add_get("/health", self.health)
+        app.router.add_get("/metrics", self.metrics)
+        app.on_startup.append(self.start)
+        app.on_cleanup.append(self.stop)
+        return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="banana chatbot HTTP service")
+    parser.add_argument("--host", help="override api_info.yaml server.host")
+    parser.add_argument("--port", type=int, help="override api_info.yaml server.port")
+    args = parser.parse_args()
+
+    punch = BananaPunch()
+    config = punch.api_info.get("server") or {}
+    service = BananaService.from_config(punch)
+    web.run_app(
+        service.app(),
+        host=args.host or config.get("host", "0.0.0.0"),
+        port=args.port or config.get("port", 8000),
+    )
@@ -0,0 +1,210 @@
+import gzip
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+
+MIN_PART_SIZE = 5 * 1024 * 1024  # S3 minimum for every part but the last
+
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
+
+def s3_client(
+    access_key: str,
+    secret_key: str,
+    endpoint: str = "https://kr.object.ncloudstorage.com",
+    region: str = "kr-standard",
+    max_connections: int = 10,
+    max_retries: int = 3,
+):
+    """
+    Returns a process-wide S3 client for the endpoint and credentials, creating it once.
+
+    boto3 clients are thread-safe, so parts can be uploaded from a thread pool
+    through one client and its connection pool. Every request, and so every
+    multipart part, is retried `max_retries` times on throttling, 5xx and
+    connection errors with botocore's jittered exponential back-off.
+    """
+    key = (endpoint, region, access_key, max_connections, max_retries)
+    with _CLIENTS_LOCK:
+        if key not in _CLIENTS:
+            _CLIENTS[key] = boto3.client(
+                service_name="s3",
+                endpoint_url=endpoint,
+                region_name=region,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                config=Config(
+                    max_pool_connections=max_connections,
+                    s3={"addressing_style": "path"},
+                    retries={"mode": "standard", "total_max_attempts": max_retries + 1},
+                ),
+            )
+        return _CLIENTS[key]
+
+
+class MultipartWriter(io.RawIOBase):
+    """
+    Binary file object that uploads what is written to S3 as a multipart upload.
+
+    Written bytes are buffered until `part_size`, then the part is handed to a
+    thread pool and uploaded while writing continues. At most `max_workers` parts
+    are in flight (writing blocks until one finishes), so memory stays around
+    `(max_workers + 1) * part_size` however large the object is. Parts are retried
+    by the client (see `s3_client`); if one still fails the upload is aborted so
+    no orphaned parts stay in the bucket.
+
+    Use it as a context manager: leaving the block completes the upload, or aborts
+    it if the block raised.
+    """
+
+    def __init__(
+        self,
+        client,
+        bucket: str,
+        key: str,
+        part_size: int = 8 * 1024 * 1024,
+        max_workers: int = 4,
+    ):
+        super().__init__()
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.bytes_written = 0
+
+        self._buffer = bytearray()
+        self._parts = []
+        self._slots = threading.BoundedSemaphore(max_workers)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._upload_id = self.client.create_multipart_upload(
+            Bucket=bucket, Key=key
+        )["UploadId"]
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self.bytes_written += len(data)
+        while len(self._buffer) >= self.part_size:
+            self._submit(bytes(self._buffer[: self.part_size]))
+            del self._buffer[: self.part_size]
+        return len(data)
+
+    def _submit(self, body: bytes):
+        self._slots.acquire()
+        part_number = len(self._parts) + 1
+        future = self._executor.submit(self._upload_part, part_number, body)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._parts.append(future)
+
+    def _upload_part(self, part_number: int, body: bytes):
+        response = self.client.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+
+    def close(self):
+        """
+        Uploads the remaining bytes and completes the upload.
+        """
+        if self.closed:
+            return
+        try:
+            if self._buffer or not self._parts:
+                self._submit(bytes(self._buffer))
+                self._buffer.clear()
+            parts = [future.result() for future in self._parts]
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            self.abort()
+            raise
+        finally:
+            self._executor.shutdown(wait=True)
+            super().close()
+
+    def abort(self):
+        for future in self._parts:
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        self.client.abort_multipart_upload(
+            Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+        )
+        super().close()
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+
+class TeeWriter(io.RawIOBase):
+    """
+    Binary file object writing to an upload (`MultipartWriter`) and a local copy.
+
+    The copy is written and closed first, so it is complete even when the upload
+    fails; `abort` closes the copy and aborts the upload.
+    """
+
+    def __init__(self, upload: MultipartWriter, copy: io.RawIOBase):
+        super().__init__()
+        self.upload = upload
+        self.copy = copy
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.copy.write(data)
+        return self.upload.write(data)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self.copy.close()
+            self.upload.close()
+        finally:
+            super().close()
+
+    def abort(self):
+        self.copy.close()
+        self.upload.abort()
+        super().close()
+
+
+class _GzipWriter(gzip.GzipFile):
+    # GzipFile leaves a fileobj it was given open; close the upload with it
+    def close(self):
+        fileobj = self.fileobj
+        super().close()
+        if fileobj is not None:
+            fileobj.close()
+
+
+def open_text(raw: io.RawIOBase, compress: bool = False):
+    """
+    Wraps a binary sink in a buffered (optionally gzip) UTF-8 text stream for `csv`.
+
+    Closing the returned stream closes `raw` as well.
+    """
+    if compress:
+        raw = _GzipWriter(fileobj=raw, mode="wb")
+    else:
+        raw = io.BufferedWriter(raw, buffer_size=1024 * 1024)
+    return io.TextIOWrapper(raw, encoding="utf-8", newline="")
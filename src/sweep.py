@@ -0,0 +1,309 @@
+import asyncio
+import itertools
+import math
+import os
+import random
+import time
+
+import pandas as pd
+
+from src.scheduler import gather_tasks
+from src.scoring import score_predictions
+
+
+# sweepable sampling parameters: api_info.yaml key -> HCX request key
+PARAM_KEYS = {
+    "temperature": "temperature",
+    "top_p": "topP",
+    "repeat_penalty": "repeatPenalty",
+    "max_tokens": "maxTokens",
+}
+
+
+def make_variants(system_prompts, grid: dict, h_params: dict, max_tokens: int = None):
+    """
+    Expands system prompts x sampling-parameter grid into a list of variants.
+
+    Args:
+        system_prompts (list | dict): Candidate system prompts; a dict names them.
+        grid (dict): api_info.yaml parameter name -> value or list of values. Parameters
+            that are not given keep their value from `h_params`.
+        max_tokens (int): Default `max_tokens` when the grid does not sweep it, i.e. the
+            task's token budget (None: `h_params["max_tokens"]`).
+    """
+    if not isinstance(system_prompts, dict):
+        system_prompts = {f"prompt_{i}": p for i, p in enumerate(system_prompts)}
+    grid = grid or {}
+    unknown = set(grid) - set(PARAM_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    if max_tokens is not None:
+        h_params = {**h_params, "max_tokens": max_tokens}
+
+    values = {
+        key: grid[key] if isinstance(grid.get(key), list) else [grid.get(key, h_params[key])]
+        for key in PARAM_KEYS
+    }
+    swept = [key for key in PARAM_KEYS if len(values[key]) > 1]
+
+    variants = []
+    for name, system_prompt in system_prompts.items():
+        for combination in itertools.product(*values.values()):
+            params = dict(zip(values.keys(), combination))
+            label = ",".join(f"{key}={params[key]}" for key in swept)
+            variants.append(
+                {
+                    "variant": f"{name}|{label}" if label else name,
+                    "prompt_name": name,
+                    "system_prompt": system_prompt,
+                    **params,
+                }
+            )
+    return variants
+
+
+async def run_sweep(hcx, variants: list, user_prompts):
+    """
+    Sends every (variant, question) request through one executor.
+
+    Requests are interleaved question by question, so all variants progress together
+    and share the executor's concurrency budget instead of running one after another.
+
+    Returns:
+        DataFrame: One row per request with the raw prediction and its latency
+            (including time spent waiting for a slot).
+    """
+
+    async def execute_request(variant: dict, idx: int, prompt: str):
+        request_data = {
+            "messages": [
+                {"role": "system", "content": variant["system_prompt"]},
+                {"role": "user", "content": prompt},
+            ],
+            **{PARAM_KEYS[key]: variant[key] for key in PARAM_KEYS},
+        }
+        start = time.perf_counter()
+        response_text = await hcx.execute_async(request_data)
+        return {
+            "variant": variant["variant"],
+            "idx": idx,
+            "pred_ori": response_text.get("content"),
+            "latency": time.perf_counter() - start,
+        }
+
+    tasks = [
+        execute_request(variant, idx, prompt)
+        for idx, prompt in enumerate(user_prompts)
+        for variant in variants
+    ]
+    return pd.DataFrame(await gather_tasks(tasks))
+
+
+def summarize(results: pd.DataFrame, variants: list):
+    summary = results.groupby("variant", sort=False).agg(
+        correct=("correct", "sum"),
+        total=("correct", "size"),
+        accuracy=("correct", "mean"),
+        latency_mean=("latency", "mean"),
+        latency_p95=("latency", lambda x: x.quantile(0.95)),
+        failed=("pred_ori", lambda x: x.isna().sum()),
+    )
+    params = pd.DataFrame(variants).set_index("variant").drop(columns="system_prompt")
+    return params.join(summary).sort_values("accuracy", ascending=False)
+
+
+def _save(summary: pd.DataFrame, results: pd.DataFrame, file_name: str):
+    os.makedirs("output", exist_ok=True)
+    path = f"output/{file_name}.xlsx"
+    with pd.ExcelWriter(path) as writer:
+        summary.to_excel(writer, sheet_name="summary")
+        results.to_excel(writer, sheet_name="results", index=False)
+    return path
+
+
+async def sweep_kmle(kmle, system_prompts, grid: dict = None, file_name: str = "sweep"):
+    """
+    Runs every system prompt x parameter combination on the KMLE questions at once.
+
+    Args:
+        kmle (KMLE): Provides the questions, prompts and executor.
+        system_prompts (list | dict): Candidate system prompts; a dict names them.
+        grid (dict): e.g. {"temperature": [0.1, 0.5], "top_p": [0.6, 0.8]}.
+        file_name (str): Results go to `output/{file_name}.xlsx` (summary and results sheets).
+
+    Returns:
+        DataFrame: Per-variant accuracy and latency, best first.
+    """
+    variants = make_variants(system_prompts, grid, kmle.h_params, kmle.max_tokens)
+    results = await run_sweep(kmle.hcx, variants, kmle.prompts)
+
+    questions = kmle._result_frame(kmle.kmle, [None] * len(kmle.kmle)).drop(
+        columns="pred_ori"
+    )
+    results = results.join(questions, on="idx")
+    results = await kmle.post.run(score_predictions, results)
+
+    summary = summarize(results, variants)
+    print(summary.drop(columns="prompt_name").to_string())
+    await kmle.post.run(_save, summary, results, file_name)
+    return summary
+
+
+async def sweep_banana(
+    punch, system_prompts, section: str, grid: dict = None, file_name: str = "sweep"
+):
+    """
+    Runs every system prompt x parameter combination on one banana section at once.
+
+    Only `intent_classifier` has labels, so the other sections report latency and
+    leave accuracy empty (score them with `BananaPunch.evaluate` on the results).
+    """
+    variants = make_variants(
+        system_prompts, grid, punch.h_params, punch.budget.max_tokens(section)
+    )
+    results = await run_sweep(punch.hcx, variants, punch.prompt_preprocessing(section))
+
+    questions = punch.questions[section].drop(columns="pred", errors="ignore")
+    results = results.join(questions, on="idx")
+    if section == "intent_classifier":
+        results["correct"] = results["pred_ori"].str.strip() == results["의도 분류"]
+    else:
+        results["correct"] = float("nan")
+
+    summary = summarize(results, variants)
+    print(summary.drop(columns="prompt_name").to_string())
+    await punch.post.run(_save, summary, results, file_name)
+    return summary
+
+
+def wilson_interval(correct: int, total: int, z: float = 1.96):
+    """
+    Wilson score interval of an accuracy; stays inside [0, 1] for small samples.
+    """
+    if total == 0:
+        return 0.0, 1.0
+    p = correct / total
+    denom = 1 + z**2 / total
+    center = (p + z**2 / (2 * total)) / denom
+    half = z * math.sqrt(p * (1 - p) / total + z**2 / (4 * total**2)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def stratified_order(questions: list, seed: int = 42):
+    """
+    Question indices shuffled within each category and interleaved across categories,
+    so every prefix of the order is (close to) a stratified sample.
+    """
+    rng = random.Random(seed)
+    by_category = {}
+    for idx, data in enumerate(questions):
+        by_category.setdefault(data["problem_category"], []).append(idx)
+    for members in by_category.values():
+        rng.shuffle(members)
+    order = []
+    for row in itertools.zip_longest(*by_category.values()):
+        order.extend(idx for idx in row if idx is not None)
+    return order
+
+
+async def successive_halving(
+    kmle,
+    system_prompts,
+    initial: int = None,
+    eta: int = 2,
+    seed: int = 42,
+    file_name: str = None,
+):
+    """
+    Finds the best system prompt with a fraction of the requests of a full run.
+
+    Every candidate first answers `initial` stratified questions through
+    `KMLE.run_test`. After each round only the best 1/`eta` candidates survive, and
+    the survivors answer `eta` times as many questions in total in the next round,
+    until one candidate is left or the questions run out. Results accumulate across
+    rounds, so no question is asked twice per candidate.
+
+    By default `initial` is `len(questions) // eta ** rounds`, with one round per
+    halving, so only the last survivor sees (about) the whole corpus; e.g. 4
+    candidates on the 24 questions of 2024 start with 6 each.
+
+    Args:
+        kmle (KMLE): Provides the questions and executor.
+        system_prompts (list | dict): Candidate system prompts; a dict names them.
+        initial (int): Questions per candidate in the first round; None derives it
+            from the corpus size and the number of rounds.
+        eta (int): Keep 1/eta of the candidates per round and grow the sample eta times.
+        file_name (str): If given, the report is written to `output/{file_name}.xlsx`.
+
+    Returns:
+        DataFrame: Per-candidate accuracy with a 95% Wilson interval, the number of
+            questions answered and the round it was dropped in, best first.
+    """
+    if not isinstance(system_prompts, dict):
+        system_prompts = {f"prompt_{i}": p for i, p in enumerate(system_prompts)}
+    order = stratified_order(kmle.kmle, seed)
+    results = {name: [] for name in system_prompts}
+    dropped = {}
+    survivors = list(system_prompts)
+
+    if initial is None:
+        rounds, left = 0, len(system_prompts)
+        while left > 1:
+            left = math.ceil(left / eta)
+            rounds += 1
+        initial = max(1, len(order) // eta**rounds)
+
+    asked = 0
+    target = min(initial, len(order))
+    round_no = 0
+    while True:
+        indices = order[asked:target]
+        frames = await asyncio.gather(
+            *[
+                kmle.run_test(system_prompts[name], indices=indices)
+                for name in survivors
+            ]
+        )
+        for name, df in zip(survivors, frames):
+            results[name].extend(df["correct"].tolist())
+        asked = target
+
+        if len(survivors) == 1 or asked == len(order):
+            break
+        keep = max(1, math.ceil(len(survivors) / eta))
+        survivors.sort(key=lambda name: sum(results[name]), reverse=True)
+        for name in survivors[keep:]:
+            dropped[name] = round_no
+        survivors = survivors[:keep]
+        target = min(asked * eta, len(order))
+        round_no += 1
+
+    rows = []
+    for name, correct in results.items():
+        low, high = wilson_interval(sum(correct), len(correct))
+        rows.append(
+            {
+                "candidate": name,
+                "correct": sum(correct),
+                "total": len(correct),
+                "accuracy": sum(correct) / len(correct) if correct else float("nan"),
+                "ci_low": low,
+                "ci_high": high,
+                "dropped_round": dropped.get(name),
+            }
+        )
+    report = (
+        pd.DataFrame(rows)
+        .set_index("candidate")
+        .sort_values(["total", "accuracy"], ascending=False)
+    )
+    report["dropped_round"] = report["dropped_round"].astype("Int64")
+
+    calls = int(report["total"].sum())
+    full = len(system_prompts) * len(order)
+    print(report.to_string())
+    print(f"Requests: {calls}/{full} ({calls / full:.1%} of a full evaluation)")
+    if file_name is not None:
+        os.makedirs("output", exist_ok=True)
+        await kmle.post.run(report.to_excel, f"output/{file_name}.xlsx")
+    return report
@@ -0,0 +1,263 @@
+import contextvars
+import itertools
+import json
+import math
+import os
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from functools import partial
+
+import pandas as pd
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:
+    otel_trace = None
+
+
+# upper bounds in seconds, Prometheus style
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_current_run = contextvars.ContextVar("current_run", default=None)
+
+
+class Span:
+    def __init__(self, span_id: int, name: str, parent, attrs: dict):
+        self.id = span_id
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else span_id
+        self.parent_id = parent.id if parent is not None else None
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class _NullSpan:
+    def set(self, **attrs):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class TraceRun:
+    """
+    Span durations and attempt counters of one run, optionally written to a JSONL
+    file as spans finish.
+    """
+
+    def __init__(self, path: str = None, max_samples: int = None):
+        self.durations = defaultdict(partial(deque, maxlen=max_samples))
+        self.attempts = Counter()
+        self.retries = Counter()
+        self._file = None
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._file = open(path, "w", encoding="utf-8")
+
+    def add_span(self, span: Span):
+        self.durations[span.name].append(span.duration)
+        if self._file is not None:
+            record = {
+                "trace": span.trace_id,
+                "span": span.id,
+                "parent": span.parent_id,
+                "name": span.name,
+                "start": span.start,
+                "duration": round(span.duration, 6),
+                **span.attrs,
+            }
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def add_attempt(self, code: str, retried: bool):
+        self.attempts[code] += 1
+        if retried:
+            self.retries[code] += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def histogram(self, name: str, buckets: tuple = LATENCY_BUCKETS):
+        """
+        Cumulative bucket counts of one span's durations: {upper bound: count <= bound}.
+        """
+        values = self.durations.get(name, [])
+        return {bound: sum(v <= bound for v in values) for bound in buckets}
+
+    def summary(self):
+        """
+        Latency percentiles per span name.
+
+        Returns:
+            DataFrame: count, total, mean, p50, p95, p99 and max seconds per span.
+        """
+        rows = {}
+        for name, values in self.durations.items():
+            series = pd.Series(values)
+            rows[name] = {
+                "count": len(values),
+                "total": series.sum(),
+                "mean": series.mean(),
+                "p50": series.quantile(0.5),
+                "p95": series.quantile(0.95),
+                "p99": series.quantile(0.99),
+                "max": series.max(),
+            }
+        return pd.DataFrame.from_dict(rows, orient="index")
+
+    def report(self):
+        if not self.durations:
+            return
+        print(self.summary().round(3).to_string())
+        print(f"Attempts by code: {dict(self.attempts)}")
+        print(f"Retries by code: {dict(self.retries)}")
+
+
+class Tracer:
+    """
+    Per-request spans, status-code counters and latency histograms.
+
+    A `request` span covers one logical call (all attempts); inside it `queue`
+    (waiting for a scheduler slot), `network` (HTTP round trip), `parse` (decoding)
+    and `backoff` (sleeping before a retry) spans show where the time went. Spans
+    nest through a context variable, so concurrent tasks keep separate traces.
+
+    Statistics accumulate on the tracer over its lifetime. Inside `run`, spans and
+    attempts of the current task (and the tasks it starts) are also recorded in a
+    `TraceRun` of their own and appended to its JSONL file, so concurrent runs
+    sharing one tracer keep separate files and summaries. `summary` gives per-span
+    latency percentiles plus attempts and retries by status code. With `otel=True`
+    and `opentelemetry` installed, spans are also emitted to the configured
+    OpenTelemetry tracer provider. `max_samples` keeps only the latest durations
+    per span name, for long-lived processes.
+    """
+
+    def __init__(self, enabled: bool = True, otel: bool = False, max_samples: int = None):
+        self.enabled = enabled
+        self.max_samples = max_samples
+        self._otel = (
+            otel_trace.get_tracer("prompt_workshop")
+            if otel and otel_trace is not None
+            else None
+        )
+        self._ids = itertools.count(1)
+        self.reset()
+
+    @classmethod
+    def from_config(cls, config: dict):
+        """
+        Builds a tracer from the `trace` section of api_info.yaml.
+        """
+        config = config or {}
+        return cls(
+            enabled=config.get("enabled", True),
+            otel=config.get("otel", False),
+            max_samples=config.get("max_samples"),
+        )
+
+    def reset(self):
+        self.stats = TraceRun(max_samples=self.max_samples)
+
+    @property
+    def durations(self):
+        return self.stats.durations
+
+    @property
+    def attempts(self):
+        return self.stats.attempts
+
+    @property
+    def retries(self):
+        return self.stats.retries
+
+    @contextmanager
+    def run(self, path: str = None):
+        """
+        Records the spans of the enclosed block (and the tasks started in it) in a
+        separate `TraceRun`, written to `path` when tracing is enabled.
+
+        Yields:
+            TraceRun: Call `report()` for the run's summary.
+        """
+        run = TraceRun(path if self.enabled else None, self.max_samples)
+        token = _current_run.set(run)
+        try:
+            yield run
+        finally:
+            _current_run.reset(token)
+            run.close()
+
+    @contextmanager
+    def span(self, name: str, **attrs):
+        """
+        Times the enclosed block as a child of the current span.
+
+        Yields:
+            Span: Call `set(key=value)` to attach attributes.
+        """
+        if not self.enabled:
+            yield _NULL_SPAN
+            return
+        span = Span(next(self._ids), name, _current_span.get(), attrs)
+        token = _current_span.set(span)
+        with ExitStack() as stack:
+            otel_span = None
+            if self._otel is not None:
+                otel_span = stack.enter_context(self._otel.start_as_current_span(name))
+            start = time.perf_counter()
+            try:
+                yield span
+            finally:
+                span.duration = time.perf_counter() - start
+                _current_span.reset(token)
+                if otel_span is not None:
+                    otel_span.set_attributes(
+                        {k: v for k, v in span.attrs.items() if v is not None}
+                    )
+                self._finish(span)
+
+    def record(self, name: str, duration: float, **attrs):
+        """
+        Records an already measured span as a child of the current span.
+        """
+        if not self.enabled:
+            return
+        span = Span(next(self._ids), name, _current_span.get(), attrs)
+        span.start -= duration
+        span.duration = duration
+        self._finish(span)
+
+    def attempt(self, code, retried: bool):
+        """
+        Counts one HTTP attempt by its status code (None: transport error).
+        """
+        if not self.enabled:
+            return
+        code = "transport" if code is None else str(code)
+        self.stats.add_attempt(code, retried)
+        run = _current_run.get()
+        if run is not None:
+            run.add_attempt(code, retried)
+
+    def _finish(self, span: Span):
+        self.stats.add_span(span)
+        run = _current_run.get()
+        if run is not None:
+            run.add_span(span)
+
+    def histogram(self, name: str, buckets: tuple = LATENCY_BUCKETS):
+        return self.stats.histogram(name, buckets)
+
+    def summary(self):
+        return self.stats.summary()
+
+    def report(self):
+        if self.enabled:
+            self.stats.report()
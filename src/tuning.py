@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import asyncio
 import base64
 import json
 import http.client
 from http import HTTPStatus
 import requests
+import aiohttp
 import argparse
 import pandas as pd
 import csv
@@ -16,42 +18,54 @@ import hashlib
 import hmac
 
 
+class RequestSigner:
+    """
+    NCP API Gateway signature (v2) for IAM-authenticated requests.
+
+    The HMAC key schedule is computed once and copied per request, and every
+    request gets a fresh timestamp, so one signer can serve long-lived clients and
+    be shared between executors and pollers.
+    """
+
+    def __init__(self, iam_access_key: str, secret_key: str):
+        self.iam_access_key = iam_access_key
+        self._mac = hmac.new(secret_key.encode("utf-8"), digestmod=hashlib.sha256)
+
+    def sign(self, method: str, uri: str, timestamp: str):
+        mac = self._mac.copy()
+        mac.update(f"{method} {uri}\n{timestamp}\n{self.iam_access_key}".encode("utf-8"))
+        return base64.b64encode(mac.digest()).decode()
+
+    def headers(self, method: str, uri: str):
+        """
+        Returns the timestamp, access key and signature headers for one request.
+        """
+        timestamp = str(int(time.time() * 1000))
+        return {
+            "X-NCP-APIGW-TIMESTAMP": timestamp,
+            "X-NCP-IAM-ACCESS-KEY": self.iam_access_key,
+            "X-NCP-APIGW-SIGNATURE-V2": self.sign(method, uri, timestamp),
+        }
+
+
 class CreateTaskExecutor:
-    def __init__(self, host, uri, method, iam_access_key, secret_key, request_id):
+    def __init__(
+        self, host, uri, method, iam_access_key, secret_key, request_id, signer=None
+    ):
         self._host = host
         self._uri = uri
         self._method = method
-        self._api_gw_time = str(int(time.time() * 1000))
-        self._iam_access_key = iam_access_key
-        self._secret_key = secret_key
+        self._signer = signer or RequestSigner(iam_access_key, secret_key)
         self._request_id = request_id
-
-    def _make_signature(self):
-        secret_key = bytes(self._secret_key, "UTF-8")
-        message = (
-            self._method
-            + " "
-            + self._uri
-            + "\n"
-            + self._api_gw_time
-            + "\n"
-            + self._iam_access_key
-        )
-        message = bytes(message, "UTF-8")
-        signing_key = base64.b64encode(
-            hmac.new(secret_key, message, digestmod=hashlib.sha256).digest()
-        )
-        return signing_key
+        self._session = requests.Session()
 
     def _send_request(self, create_request):
 
         headers = {
-            "X-NCP-APIGW-TIMESTAMP": self._api_gw_time,
-            "X-NCP-IAM-ACCESS-KEY": self._iam_access_key,
-            "X-NCP-APIGW-SIGNATURE-V2": self._make_signature(),
+            **self._signer.headers(self._method, self._uri),
             "X-NCP-CLOVASTUDIO-REQUEST-ID": self._request_id,
         }
-        result = requests.post(
+        result = self._session.post(
             self._host + self._uri, json=create_request, headers=headers
         ).json()
         return result
@@ -65,43 +79,24 @@ class CreateTaskExecutor:
 
 
 class FindTaskExecutor:
-    def __init__(self, host, uri, method, iam_access_key, secret_key, request_id):
+    def __init__(
+        self, host, uri, method, iam_access_key, secret_key, request_id, signer=None
+    ):
         self._host = host
         self._uri = uri
         self._method = method
-        self._api_gw_time = str(int(time.time() * 1000))
-        self._iam_access_key = iam_access_key
-        self._secret_key = secret_key
+        self._signer = signer or RequestSigner(iam_access_key, secret_key)
         self._request_id = request_id
-
-    def _make_signature(self, task_id):
-        secret_key = bytes(self._secret_key, "UTF-8")
-        message = (
-            self._method
-            + " "
-            + self._uri
-            + task_id
-            + "\n"
-            + self._api_gw_time
-            + "\n"
-            + self._iam_access_key
-        )
-        message = bytes(message, "UTF-8")
-        signing_key = base64.b64encode(
-            hmac.new(secret_key, message, digestmod=hashlib.sha256).digest()
-        )
-        return signing_key
+        self._session = requests.Session()
 
     def _send_request(self, task_id):
         headers = {
             "Content-Type": "application/json; charset=utf-8",
-            "X-NCP-APIGW-TIMESTAMP": self._api_gw_time,
-            "X-NCP-IAM-ACCESS-KEY": self._iam_access_key,
-            "X-NCP-APIGW-SIGNATURE-V2": self._make_signature(task_id),
+            **self._signer.headers(self._method, self._uri + task_id),
             "X-NCP-CLOVASTUDIO-REQUEST-ID": self._request_id,
         }
 
-        result = requests.get(self._host + self._uri + task_id, headers=headers).json()
+        result = self._session.get(self._host + self._uri + task_id, headers=headers).json()
         return result
 
     def execute(self, taskId):
@@ -112,12 +107,31 @@ class FindTaskExecutor:
             return res
 
 
-def create_task(file_name: str):
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "CANCELED", "CANCELLED"}
+
+
+def dataset_key(file_name: str):
+    """
+    Object key of a training dataset: the key `generate_tuning_data` returned
+    (`.csv` or `.csv.gz`) is used as is, a bare name gets `.csv`.
+    """
+    if file_name.endswith((".csv", ".csv.gz")):
+        return file_name
+    return file_name + ".csv"
+
+
+def create_task(
+    file_name: str,
+    host: str = "https://clovastudio.apigw.ntruss.com",
+    name: str = "prompt_workshop_practice",
+    train_epochs: int = 4,
+    learning_rate: float = 1e-4,
+):
     with open("api_info.yaml") as f:
         h_params = yaml.load(f, Loader=yaml.FullLoader)["colab"]
 
     completion_executor = CreateTaskExecutor(
-        host="https://clovastudio.apigw.ntruss.com",
+        host=host,
         uri="/tuning/v2/tasks",
         method="POST",
         iam_access_key=h_params["access_key"],
@@ -126,14 +140,14 @@ def create_task(file_name: str):
     )
 
     request_data = {
-        "name": "prompt_workshop_practice",
+        "name": name,
         "model": h_params["model"],
         "method": "LORA",
         "taskType": "GENERATION",
-        "trainEpochs": 4,
-        "learningRate": 1e-4,
+        "trainEpochs": train_epochs,
+        "learningRate": learning_rate,
         "trainingDatasetBucket": "dhlab.workshop",
-        "trainingDatasetFilePath": file_name + ".csv",
+        "trainingDatasetFilePath": dataset_key(file_name),
         "trainingDatasetAccessKey": h_params["access_key"],
         "trainingDatasetSecretKey": h_params["secret_key"],
     }
@@ -143,12 +157,12 @@ def create_task(file_name: str):
     return response
 
 
-def find_task(task_id: str):
+def find_task(task_id: str, host: str = "https://clovastudio.apigw.ntruss.com"):
     with open("api_info.yaml") as f:
         h_params = yaml.load(f, Loader=yaml.FullLoader)["colab"]
 
     completion_executor = FindTaskExecutor(
-        host="https://clovastudio.apigw.ntruss.com",
+        host=host,
         uri="/tuning/v2/tasks/",
         method="GET",
         iam_access_key=h_params["access_key"],
@@ -158,56 +172,314 @@ def find_task(task_id: str):
 
     response = completion_executor.execute(task_id)
     print(response)
+    return response
+
+
+class TuningManager:
+    """
+    Submits LoRA tuning tasks and follows them without blocking.
+
+    All calls share one keep-alive aiohttp session. `watch` polls every task
+    concurrently; a task whose status did not change is polled with exponential
+    back-off (`poll_interval` doubling up to `max_interval`), and the interval
+    resets whenever its status changes. Status transitions are yielded as events
+    until every task reached a terminal status.
+
+        async with TuningManager.from_config(h_params) as manager:
+            tasks = await manager.submit_grid("jd_kmle_2023", [2, 4], [1e-4, 5e-5])
+            async for event in manager.watch([task["id"] for task in tasks]):
+                print(event)
+    """
+
+    def __init__(
+        self,
+        host: str,
+        iam_access_key: str,
+        secret_key: str,
+        request_id: str,
+        model: str = "HCX-003",
+        bucket: str = "dhlab.workshop",
+        poll_interval: float = 10,
+        max_interval: float = 300,
+        timeout: float = 60,
+        signer: RequestSigner = None,
+    ):
+        self._host = host
+        self._iam_access_key = iam_access_key
+        self._secret_key = secret_key
+        self._request_id = request_id
+        self.signer = signer or RequestSigner(iam_access_key, secret_key)
+        self.model = model
+        self.bucket = bucket
+        self.poll_interval = poll_interval
+        self.max_interval = max_interval
+        self._timeout = timeout
+
+        self._session = None
+        self._session_loop = None
+
+    @classmethod
+    def from_config(
+        cls, h_params: dict, host: str = "https://clovastudio.apigw.ntruss.com", **kwargs
+    ):
+        """
+        Builds a manager from the `colab` section of api_info.yaml.
+        """
+        return cls(
+            host=host,
+            iam_access_key=h_params["access_key"],
+            secret_key=h_params["secret_key"],
+            request_id=h_params["request_id"][0],
+            model=h_params["model"],
+            **kwargs,
+        )
+
+    def _get_session(self):
+        loop = asyncio.get_running_loop()
+        if (
+            self._session is None
+            or self._session.closed
+            or self._session_loop is not loop
+        ):
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+            )
+            self._session_loop = loop
+        return self._session
+
+    def _headers(self, method: str, uri: str):
+        return {
+            "Content-Type": "application/json; charset=utf-8",
+            **self.signer.headers(method, uri),
+            "X-NCP-CLOVASTUDIO-REQUEST-ID": self._request_id,
+        }
+
+    async def _request(self, method: str, uri: str, body: dict = None):
+        async with self._get_session().request(
+            method, self._host + uri, json=body, headers=self._headers(method, uri)
+        ) as response:
+            try:
+                res = await response.json(content_type=None)
+            except ValueError:
+                # e.g. an HTML error page from the gateway
+                text = await response.text()
+                raise RuntimeError(
+                    f"{method} {uri} failed: HTTP {response.status} {text[:200]!r}"
+                )
+        if isinstance(res, dict) and res.get("status", {}).get("code") == "20000":
+            return res["result"]
+        raise RuntimeError(f"{method} {uri} failed: {res}")
+
+    async def submit(
+        self,
+        file_name: str,
+        name: str = "prompt_workshop_practice",
+        train_epochs: int = 4,
+        learning_rate: float = 1e-4,
+    ):
+        """
+        Creates one LoRA task on the `file_name` dataset in the tuning bucket (see
+        `dataset_key`).
+
+        Returns:
+            dict: The created task (`id`, `status`, ...).
+        """
+        request_data = {
+            "name": name,
+            "model": self.model,
+            "method": "LORA",
+            "taskType": "GENERATION",
+            "trainEpochs": train_epochs,
+            "learningRate": learning_rate,
+            "trainingDatasetBucket": self.bucket,
+            "trainingDatasetFilePath": dataset_key(file_name),
+            "trainingDatasetAccessKey": self._iam_access_key,
+            "trainingDatasetSecretKey": self._secret_key,
+        }
+        return await self._request("POST", "/tuning/v2/tasks", request_data)
+
+    async def submit_grid(
+        self,
+        file_name: str,
+        epochs: list,
+        learning_rates: list,
+        name: str = "prompt_workshop_practice",
+    ):
+        """
+        Creates one task per (epoch, learning rate) pair, concurrently.
+
+        Returns:
+            list: The created tasks, each with the `trainEpochs`/`learningRate` it got.
+        """
+        grid = [(e, lr) for e in epochs for lr in learning_rates]
+        tasks = await asyncio.gather(
+            *[
+                self.submit(file_name, f"{name}_e{e}_lr{lr:g}", e, lr)
+                for e, lr in grid
+            ]
+        )
+        for task, (e, lr) in zip(tasks, grid):
+            task.setdefault("trainEpochs", e)
+            task.setdefault("learningRate", lr)
+        return tasks
+
+    async def find(self, task_id: str):
+        return await self._request("GET", "/tuning/v2/tasks/" + task_id)
+
+    async def watch(self, task_ids: list):
+        """
+        Polls the tasks concurrently and yields every status change.
+
+        Yields:
+            dict: {"task_id", "previous", "status", "elapsed", "result"}; the first
+                event of each task has `previous` None. Failed polls are retried with
+                the same back-off and yielded with status "POLL_ERROR" after
+                5 failures in a row.
+        """
+        queue = asyncio.Queue()
+        start = time.monotonic()
+
+        async def poll(task_id: str):
+            status = None
+            interval = self.poll_interval
+            failures = 0
+            while status not in TERMINAL_STATUSES:
+                try:
+                    result = await self.find(task_id)
+                    failures = 0
+                except (aiohttp.ClientError, asyncio.TimeoutError, RuntimeError) as e:
+                    failures += 1
+                    if failures >= 5:
+                        result = {"status": "POLL_ERROR", "error": str(e)}
+                    else:
+                        result = None
+                if result is not None and result.get("status") != status:
+                    await queue.put(
+                        {
+                            "task_id": task_id,
+                            "previous": status,
+                            "status": result.get("status"),
+                            "elapsed": time.monotonic() - start,
+                            "result": result,
+                        }
+                    )
+                    status = result.get("status")
+                    interval = self.poll_interval
+                    if status == "POLL_ERROR":
+                        break
+                else:
+                    interval = min(self.max_interval, interval * 2)
+                if status not in TERMINAL_STATUSES:
+                    await asyncio.sleep(interval)
+
+        pollers = [asyncio.create_task(poll(task_id)) for task_id in task_ids]
+        done = asyncio.gather(*pollers)
+        try:
+            while not (done.done() and queue.empty()):
+                getter = asyncio.ensure_future(queue.get())
+                await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+            await done
+        finally:
+            for poller in pollers:
+                poller.cancel()
+
+    async def wait(self, task_ids: list):
+        """
+        Prints status transitions until every task finished.
+
+        Returns:
+            dict: task id -> final task result.
+        """
+        final = {}
+        async for event in self.watch(task_ids):
+            print(
+                f"[{event['elapsed']:7.1f}s] {event['task_id']}: "
+                f"{event['previous']} -> {event['status']}"
+            )
+            final[event["task_id"]] = event["result"]
+        return final
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+async def sweep(
+    file_name: str,
+    epochs: list,
+    learning_rates: list,
+    name: str = "prompt_workshop_practice",
+    host: str = "https://clovastudio.apigw.ntruss.com",
+    poll_interval: float = 10,
+):
+    """
+    Submits an epoch x learning-rate grid of tasks and follows them until all finished.
+    """
+    with open("api_info.yaml") as f:
+        h_params = yaml.load(f, Loader=yaml.FullLoader)["colab"]
+
+    async with TuningManager.from_config(
+        h_params, host, poll_interval=poll_interval
+    ) as manager:
+        tasks = await manager.submit_grid(file_name, epochs, learning_rates, name)
+        for task in tasks:
+            print(
+                f"{task['id']}: epochs={task['trainEpochs']}, lr={task['learningRate']}"
+            )
+        return await manager.wait([task["id"] for task in tasks])
 
 
 if __name__ == "__main__":
 
-    parser = argparse.ArgumentParser(description="간단 설명")
-    parser.add_argument("--name", "-n", required=True, help="task_id")
+    parser = argparse.ArgumentParser(description="HCX LoRA tuning tasks")
+    parser.add_argument(
+        "--name", "-n", required=True, help="task name (create, sweep) or task_id (find)"
+    )
     parser.add_argument(
         "--type",
         "-t",
         required=True,
-        choices=["create", "find"],
-        help="choice from (create, find)",
+        choices=["create", "find", "sweep"],
+        help="choice from (create, find, sweep)",
+    )
+    parser.add_argument(
+        "--data",
+        "-d",
+        help="training file in the bucket (.csv or .csv.gz; a bare name gets .csv)",
+    )
+    parser.add_argument("--epoch", "-e", help="epoch(s)", type=int, nargs="+", default=[4])
+    parser.add_argument(
+        "--lr", "-l", help="learning rate(s)", type=float, nargs="+", default=[1e-4]
     )
-    parser.add_argument("--data", "-d", help="data source")
-    parser.add_argument("--epoch", "-e", help="epoch", default=4)
-    parser.add_argument("--lr", "-l", help="learning rate", default=1e-4)
+    parser.add_argument("--host", default="https://clovastudio.apigw.ntruss.com")
+    parser.add_argument("--poll-interval", type=float, default=10)
     args = parser.parse_args()
 
-    with open("api_info.yaml") as f:
-        h_params = yaml.load(f, Loader=yaml.FullLoader)["hcx_tuning"]
+    if args.type in ("create", "sweep") and args.data is None:
+        parser.error("--data is required for create and sweep")
 
     if args.type == "create":
-        create_task_executor = CreateTaskExecutor(
-            host="api-hyperclova.navercorp.com",
-            client_id=h_params["id"],
-            client_secret=h_params["secret"],
-        )
-
-        request_data = {
-            "name": args.name,
-            "model": h_params["model"],
-            "method": "LORA",
-            "taskType": "GENERATION",
-            "trainEpochs": args.epoch,
-            "learningRate": args.lr,
-            "trainingDataset": args.data,
-        }
-
-        response = create_task_executor.execute(request_data)
-        print(response)
+        create_task(args.data, args.host, args.name, args.epoch[0], args.lr[0])
 
     elif args.type == "find":
-        find_task_executor = FindTaskExecutor(
-            host="api-hyperclova.navercorp.com",
-            client_id=h_params["id"],
-            client_secret=h_params["secret"],
-            task_id=args.name,
-        )
-
-        request_data = {}
+        find_task(args.name, args.host)
 
-        response = find_task_executor.execute(request_data)
-        print(response)
+    elif args.type == "sweep":
+        asyncio.run(
+            sweep(
+                args.data, args.epoch, args.lr, args.name, args.host, args.poll_interval
+            )
+        )
@@ -1,22 +1,73 @@
-import json
-import random
-from collections import defaultdict
+import hashlib
+import os
+from collections.abc import Mapping
 
 import yaml
 import pandas as pd
 
+from src.dataset import KMLEDataset
+
+
+SECTIONS = [
+    "intent_classifier",
+    "store_inquiry_handler",
+    "product_inquiry_handler",
+    "unwanted_topic_blocker",
+]
+
+
+class QuestionStore(Mapping):
+    """
+    Lazily loaded sections of the banana punch workbook.
+
+    A section is read on first access from a per-sheet pickle cache keyed on the
+    workbook's sha256. On a cache miss the workbook is parsed once (all sheets in
+    a single pass) and every sheet is written to the cache.
+    """
+
+    def __init__(self, path: str = "data/banana_punch.xlsx", sections: list = None):
+        self.path = path
+        self.sections = sections or SECTIONS
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        self.cache_dir = os.path.join(
+            os.path.dirname(path), ".cache", f"{os.path.basename(path)}.{digest}"
+        )
+        self._loaded = {}
+
+    def _cache_path(self, section: str):
+        return os.path.join(self.cache_dir, f"{section}.pkl")
+
+    def _parse_workbook(self):
+        sheets = pd.read_excel(self.path, sheet_name=list(range(len(self.sections))))
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for i, name in enumerate(self.sections):
+                sheets[i].to_pickle(self._cache_path(name))
+        except OSError:
+            pass
+        return {name: sheets[i] for i, name in enumerate(self.sections)}
+
+    def __getitem__(self, section: str):
+        if section not in self.sections:
+            raise KeyError(section)
+        if section not in self._loaded:
+            if os.path.exists(self._cache_path(section)):
+                self._loaded[section] = pd.read_pickle(self._cache_path(section))
+            else:
+                for name, df in self._parse_workbook().items():
+                    self._loaded.setdefault(name, df)
+        return self._loaded[section]
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    def __len__(self):
+        return len(self.sections)
+
 
 def load_questions():
-    section = [
-        "intent_classifier",
-        "store_inquiry_handler",
-        "product_inquiry_handler",
-        "unwanted_topic_blocker",
-    ]
-    return {
-        name: pd.read_excel("data/banana_punch.xlsx", sheet_name=i)
-        for i, name in enumerate(section)
-    }
+    return QuestionStore()
 
 
 def load_kmle(train: bool = False):
@@ -24,25 +75,10 @@ def load_kmle(train: bool = False):
         target_year = "2023"
     else:
         target_year = "2024"
-    data = []
-    with open(f"data/kmle_{target_year}.jsonl", "r") as f:
-        for line in f:
-            data.append(json.loads(line))
-    data = [x for x in data if not x["has_picture"] or x["has_picture"] == "no" or "비공개" not in x["answer"]]
-
-    category_dict = defaultdict(list)
-    for item in data:
-        category = item["problem_category"]
-        category_dict[category].append(item)
-
-    random.seed(42)
-
-    sampled_data = []
-    for category, items in category_dict.items():
-        sampled_items = random.sample(items, min(6, len(items)))
-        sampled_data.extend(sampled_items)
 
-    return sampled_data
+    with KMLEDataset(target_year) as dataset:
+        sample = dataset.filter(usable=True).stratified_sample(per_category=6, seed=42)
+        return sample.to_list()
 
 
 def load_yaml(path):